@@ -1,7 +1,11 @@
 # api.py
 
-import requests
 import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # 쿠키 파일을 읽어오는 함수
 def load_cookies():
@@ -13,10 +17,31 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
 }
 
+TIMEOUT = (3.05, 10)  # (연결, 읽기) 초
+
+# 벤치마크에서는 로컬 가짜 서버 주소로 바꿔서 쓴다
+CHZZK_API_URL = 'https://api.chzzk.naver.com'
+GAME_API_URL = 'https://comm-api.game.naver.com'
+CHZZK_CHAT_URL = 'wss://kr-ss1.chat.naver.com/chat'
+
+def create_session():
+    """keep-alive 연결을 재사용하고, 일시적인 오류는 backoff 하면서 재시도하는 세션."""
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(HEADERS)
+    return session
+
+# 모든 API 호출이 같은 세션(연결 풀)을 공유한다
+session = create_session()
+
 def fetch_chatChannelId(streamer: str, cookies: dict) -> str:
-    url = f'https://api.chzzk.naver.com/polling/v2/channels/{streamer}/live-status'
+    url = f'{CHZZK_API_URL}/polling/v2/channels/{streamer}/live-status'
     try:
-        response = requests.get(url, cookies=cookies, headers=HEADERS)
+        response = session.get(url, cookies=cookies, timeout=TIMEOUT)
         response.raise_for_status()
         response = response.json()
         chatChannelId = response['content']['chatChannelId']
@@ -27,9 +52,9 @@ def fetch_chatChannelId(streamer: str, cookies: dict) -> str:
         raise e
 
 def fetch_channelName(streamer: str) -> str:
-    url = f'https://api.chzzk.naver.com/service/v1/channels/{streamer}'
+    url = f'{CHZZK_API_URL}/service/v1/channels/{streamer}'
     try:
-        response = requests.get(url, headers=HEADERS)
+        response = session.get(url, timeout=TIMEOUT)
         response.raise_for_status()
         response = response.json()
         return response['content']['channelName']
@@ -38,9 +63,9 @@ def fetch_channelName(streamer: str) -> str:
         raise e
 
 def fetch_accessToken(chatChannelId, cookies: dict) -> str:
-    url = f'https://comm-api.game.naver.com/nng_main/v1/chats/access-token?channelId={chatChannelId}&chatType=STREAMING'
+    url = f'{GAME_API_URL}/nng_main/v1/chats/access-token?channelId={chatChannelId}&chatType=STREAMING'
     try:
-        response = requests.get(url, cookies=cookies, headers=HEADERS)
+        response = session.get(url, cookies=cookies, timeout=TIMEOUT)
         response.raise_for_status()
         response = response.json()
         return response['content']['accessToken'], response['content']['extraToken']
@@ -49,12 +74,36 @@ def fetch_accessToken(chatChannelId, cookies: dict) -> str:
         raise e
 
 def fetch_userIdHash(cookies: dict) -> str:
-    url = 'https://comm-api.game.naver.com/nng_main/v1/user/getUserStatus'
+    url = f'{GAME_API_URL}/nng_main/v1/user/getUserStatus'
     try:
-        response = requests.get(url, cookies=cookies, headers=HEADERS)
+        response = session.get(url, cookies=cookies, timeout=TIMEOUT)
         response.raise_for_status()
         response = response.json()
         return response['content']['userIdHash']
     except Exception as e:
         print(f"Error fetching userIdHash: {e}")
         raise e
+
+class ChannelStatusPoller(threading.Thread):
+    """
+    chatChannelId가 바뀌었는지 백그라운드에서 주기적으로 확인하는 스레드.
+    웹소켓 읽기 루프는 HTTP를 기다리지 않고 캐시된 chatChannelId만 확인한다.
+    """
+
+    def __init__(self, streamer, cookies, chatChannelId=None, interval=30):
+        super().__init__(daemon=True)
+        self.streamer = streamer
+        self.cookies = cookies
+        self.chatChannelId = chatChannelId
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.chatChannelId = fetch_chatChannelId(self.streamer, self.cookies)
+            except Exception:
+                pass  # 실패하면 이전 값을 그대로 둔다 (오류 내용은 fetch 함수에서 출력)
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,68 @@
+# audio_player.py
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+from pydub import AudioSegment
+from pydub.playback import play
+
+
+class AudioPlayer:
+    """
+    출력 스트림 하나를 계속 열어두고, PCM 조각이 도착하는 대로 바로 써넣는 플레이어.
+    pyaudio가 없으면 예전처럼 문장 단위로 모아서 pydub으로 재생한다.
+    lipsync가 있으면 조각을 쓰기 직전에 넘겨서 입 모양이 같은 재생 시계를 따라가게 한다.
+    """
+
+    def __init__(self, sample_rate, channels=1, sample_width=2, lipsync=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.lipsync = lipsync
+        self.audio = None
+        self.stream = None
+
+        if pyaudio is not None:
+            self.audio = pyaudio.PyAudio()
+            self.stream = self.audio.open(
+                format=self.audio.get_format_from_width(sample_width),
+                channels=channels,
+                rate=sample_rate,
+                output=True
+            )
+        else:
+            print("pyaudio가 설치되어 있지 않아 문장 단위로 재생합니다.")
+
+    def play(self, speech):
+        if self.stream is None:
+            pcm = b"".join(speech.chunks())
+            if self.lipsync is not None:
+                self.lipsync.begin()
+                self.lipsync.feed(pcm)
+            play(AudioSegment(data=pcm, sample_width=self.sample_width,
+                              frame_rate=self.sample_rate, channels=self.channels))
+            if self.lipsync is not None:
+                self.lipsync.end()
+            return
+
+        if self.lipsync is None:
+            for chunk in speech.chunks():
+                self.stream.write(chunk)
+            return
+
+        self.lipsync.begin(self.stream.get_output_latency())
+        try:
+            for chunk in speech.chunks():
+                self.lipsync.feed(chunk)
+                self.stream.write(chunk)
+        finally:
+            self.lipsync.end()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.audio.terminate()
+            self.stream = None
@@ -0,0 +1,83 @@
+# benchmarks/bench_decoder.py
+# 치지직 채팅 프레임 파싱 속도 비교: 기존 방식(json.loads 2번 + datetime) vs ChzzkDecoder
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cmd_type import CHZZK_CHAT_CMD
+from chzzk_decoder import ChzzkDecoder
+
+
+def make_frames(frame_count, batch_size, user_count):
+    profiles = {
+        f"user{i}": json.dumps({"userIdHash": f"user{i}", "nickname": f"시청자{i}", "profileImageUrl": "",
+                                "userRoleCode": "common_user", "badge": None, "title": None,
+                                "verifiedMark": False, "activityBadges": [],
+                                "streamingProperty": {}}, ensure_ascii=False)
+        for i in range(user_count)
+    }
+    now = int(time.time() * 1000)
+    frames = []
+    for i in range(frame_count):
+        bdy = []
+        for j in range(batch_size):
+            uid = f"user{random.randrange(user_count)}"
+            bdy.append({"svcid": "game", "cid": "channel", "mbrCnt": 1000, "uid": uid, "profile": profiles[uid],
+                        "msg": "테리 오늘 무슨 게임 해요?", "msgTypeCode": 1, "msgStatusType": "NORMAL",
+                        "extras": "{}", "ctime": now, "utime": now, "msgTime": now + i * 100 + j})
+        frames.append(json.dumps({"svcid": "game", "ver": "1", "bdy": bdy, "cmd": CHZZK_CHAT_CMD['chat'],
+                                  "tid": None, "cid": "channel"}, ensure_ascii=False))
+    return frames
+
+
+def baseline(frames):
+    count = 0
+    for raw_message in frames:
+        raw_message = json.loads(raw_message)
+        for chat_data in raw_message['bdy']:
+            nickname = '익명의 후원자' if chat_data['uid'] == 'anonymous' else json.loads(chat_data['profile'])["nickname"]
+            message = chat_data.get('msg', '')
+            now = datetime.datetime.fromtimestamp(chat_data['msgTime'] / 1000)
+            now = datetime.datetime.strftime(now, '%Y-%m-%d %H:%M:%S')
+            line = f'[{now}][채팅] {nickname} : {message}'
+            count += 1
+    return count
+
+
+def decoder(frames):
+    decoder = ChzzkDecoder()
+    count = 0
+    for raw_message in frames:
+        _, records = decoder.decode(raw_message)
+        for record in records:
+            line = f'[{decoder.format_time(record.msg_time)}][{record.chat_type}] {record.nickname} : {record.message}'
+            count += 1
+    return count
+
+
+def measure(name, func, frames):
+    start = time.perf_counter()
+    count = func(frames)
+    elapsed = time.perf_counter() - start
+    print(f"{name:10s} {count / elapsed:12,.0f} messages/s ({elapsed * 1000:.1f} ms)")
+    return count / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=5, help='프레임 하나에 들어 있는 채팅 수')
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.batch, args.users)
+    old = measure("baseline", baseline, frames)
+    new = measure("decoder", decoder, frames)
+    print(f"x{new / old:.2f}")
@@ -0,0 +1,177 @@
+# benchmarks/bench_pipeline.py
+# 치지직/유튜브 채팅 -> LLM -> 번역 -> TTS -> 재생 전체를 가짜 서비스로 돌려서
+# 채팅부터 첫 소리까지 걸린 시간, 분당 처리량, 버려진 비율, 메모리 증가량을 잰다.
+#
+# 실제 네트워크, 치지직 로그인, GPU, 스피커 없이 돈다. 변경 전후로 같은 옵션으로 돌려서 비교한다.
+#   python benchmarks/bench_pipeline.py --duration 120 --chzzk_rate 2 --youtube_rate 0.5
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import (LatencyTracker, FakeChzzkApi, FakeChzzkChat, FakeOllama, FakeElevenLabs,
+                   FakeYoutubeChat, FakeTranslator, NullAudioPlayer)
+
+
+def rss_bytes():
+    """현재 프로세스의 RSS. /proc이 없는 OS에서는 0."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def make_workdir(fake_services=True):
+    """
+    실제 설정을 바탕으로, 캐시/DB/로그가 임시 폴더에 생기도록 바꾼 config.json을 가진 작업 폴더를 만든다.
+    fake_services가 False이면 ollama/ElevenLabs 설정은 그대로 두고 저장되는 것만 임시 폴더로 돌린다.
+    """
+    workdir = tempfile.mkdtemp(prefix="terry_bench_")
+    with open(os.path.join(ROOT, "config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    if fake_services:
+        config["eleven_labs"].update({"api_key": "bench", "voice_id": "bench", "output_format": "pcm_24000"})
+    config.setdefault("tts_cache", {}).update({"dir": os.path.join(workdir, "tts_cache"), "prewarm": False})
+    config.setdefault("user_memory", {}).update({"db_path": os.path.join(workdir, "user_data", "user_memory.db"),
+                                                 "legacy_dir": os.path.join(workdir, "user_data")})
+    config.setdefault("long_term_memory", {})["path"] = os.path.join(workdir, "user_data", "long_term_memory")
+    config.setdefault("translation", {})["cache_path"] = None
+    # 조용한 틈에 혼잣말을 만들면 LLM 호출 수와 지연 측정이 섞이므로 끈다
+    config.setdefault("idle", {})["enabled"] = False
+    # 채팅마다 붙는 #번호가 캐시 키에 남더라도, 같은 질문이 반복되는 벤치에서 캐시가 맞으면
+    # 예전 번호가 든 대답이 재생되어 새 채팅이 응답받지 못한 것으로 잡힌다. 파이프라인 자체만 잰다
+    config.setdefault("response_cache", {})["enabled"] = False
+    # 벤치 중에 방송 중인 아바타 입을 움직이지 않는다
+    config.setdefault("lipsync", {})["enabled"] = False
+
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2, ensure_ascii=False)
+    return workdir
+
+
+def start_offline(llm_first_token=0.3, llm_token_interval=0.02, tts_first_byte=0.25):
+    """가짜 ollama/ElevenLabs를 띄우고, 임시 작업 폴더로 옮긴 뒤 그쪽을 보도록 terry 모듈을 불러온다."""
+    ollama_server = FakeOllama(llm_first_token, llm_token_interval)
+    eleven_labs = FakeElevenLabs(tts_first_byte)
+
+    # ollama 클라이언트는 import할 때 OLLAMA_HOST를 읽으므로 terry를 불러오기 전에 정한다
+    os.environ["OLLAMA_HOST"] = ollama_server.url
+    workdir = make_workdir()
+    os.chdir(workdir)
+
+    import tts
+    from terry_module import load_terry
+
+    tts.ELEVENLABS_STREAM_URL = eleven_labs.url
+    return load_terry(), ollama_server, eleven_labs, workdir
+
+
+def run(args):
+    tracker = LatencyTracker()
+    chzzk_api = FakeChzzkApi()
+    chzzk_chat = FakeChzzkChat(tracker, rate=args.chzzk_rate, users=args.users)
+    terry, ollama_server, eleven_labs, workdir = start_offline(args.llm_first_token, args.llm_token_interval,
+                                                               args.tts_first_byte)
+
+    import api
+    api.CHZZK_API_URL = chzzk_api.url
+    api.GAME_API_URL = chzzk_api.url
+    terry.ChzzkChat.chat_url = chzzk_chat.url
+
+    youtube_chat = FakeYoutubeChat(tracker, chzzk_chat.sending, rate=args.youtube_rate, users=args.users)
+    terry.pytchat.create = lambda video_id, **kwargs: youtube_chat
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        chatbot = terry.ChatBot()
+        chatbot.player = NullAudioPlayer(tracker, chatbot.tts.sample_rate)
+        translator = FakeTranslator()
+        chatbot.translator.translators['ko'] = translator
+
+        chzzkchat = terry.ChzzkChat("bench-streamer", {"NID_AUT": "bench", "NID_SES": "bench"}, terry.get_logger(), chatbot)
+        threading.Thread(target=chzzkchat.run, daemon=True).start()
+        if args.youtube_rate > 0:
+            threading.Thread(target=chatbot.fetch_youtube_chat, args=("bench-video",), daemon=True).start()
+
+        rss_before = rss_bytes()
+        started = time.monotonic()
+        chzzk_chat.sending.set()
+        time.sleep(args.duration)
+        chzzk_chat.sending.clear()
+
+        # 이미 받은 채팅이 다 재생될 때까지(최대 drain초) 기다린다
+        deadline = time.monotonic() + args.drain
+        while time.monotonic() < deadline and not chatbot.pipeline.is_idle():
+            time.sleep(0.2)
+        elapsed = time.monotonic() - started
+        rss_after = rss_bytes()
+
+    sent = chzzk_chat.sent + youtube_chat.sent
+    latencies = tracker.latencies()
+    answered = len(latencies)
+    result = {
+        "duration": args.duration,
+        "chat_sent": sent,
+        "chat_answered": answered,
+        "answered_per_minute": round(answered * 60 / elapsed, 2),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p90": percentile(latencies, 0.9),
+        "latency_p99": percentile(latencies, 0.99),
+        "unanswered_rate": round(1 - answered / sent, 4) if sent else None,
+        "filter_dropped": dict(chatbot.chat_filter.dropped),
+        "pipeline_dropped": chatbot.pipeline.dropped,
+        "llm_calls": ollama_server.calls,
+        "tts_calls": eleven_labs.calls,
+        "translate_calls": translator.calls,
+        "audio_seconds": round(chatbot.player.played_seconds, 1),
+        "rss_growth_mb": round((rss_after - rss_before) / (1024 * 1024), 2),
+    }
+
+    # 임시 폴더를 지우기 전에 닫아야 atexit 저장이 없는 폴더에 쓰려다 실패하지 않는다
+    chatbot.long_term_memory.close()
+    chatbot.user_memory.close()
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--duration', type=float, default=60, help='채팅을 보내는 시간(초)')
+    parser.add_argument('--drain', type=float, default=60, help='보내기를 멈춘 뒤 남은 응답을 기다리는 최대 시간(초)')
+    parser.add_argument('--chzzk_rate', type=float, default=1.0, help='치지직 초당 채팅 수')
+    parser.add_argument('--youtube_rate', type=float, default=0.3, help='유튜브 초당 채팅 수')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--llm_first_token', type=float, default=0.3)
+    parser.add_argument('--llm_token_interval', type=float, default=0.02)
+    parser.add_argument('--tts_first_byte', type=float, default=0.25)
+    parser.add_argument('--output', type=str, default=None, help='결과를 JSON 파일로도 저장')
+    parser.add_argument('--verbose', action='store_true', help='Terry 출력을 그대로 보여준다')
+    args = parser.parse_args()
+
+    result = run(args)
+    for name, value in result.items():
+        print(f"{name:22s} {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,317 @@
+# benchmarks/fakes.py
+# 벤치마크용 가짜 서비스들: 치지직 REST/웹소켓, ollama, ElevenLabs, 번역기, pytchat, 오디오 출력
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+import websockets
+
+from cmd_type import CHZZK_CHAT_CMD
+
+MESSAGE_ID = re.compile(r'#\d+')
+
+QUESTIONS = [
+    "테리 몇 살이에요?",
+    "MBTI 뭐예요?",
+    "오늘 무슨 게임 해요?",
+    "저녁 뭐 먹었어요?",
+    "노래 불러주세요",
+    "어제 방송 재밌었어요",
+    "테리 최애 음식은 뭐예요?",
+    "이 게임 어려워요?",
+]
+
+
+class LatencyTracker:
+    """보낸 채팅마다 #번호를 붙이고, 그 번호가 들어간 음성이 처음 재생되기까지 걸린 시간을 잰다."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.sent = {}
+        self.first_audio = {}
+
+    def new_message(self, text):
+        with self.lock:
+            self.next_id += 1
+            message_id = f"#{self.next_id}"
+            self.sent[message_id] = time.monotonic()
+        return f"{text} {message_id}"
+
+    def heard(self, text):
+        now = time.monotonic()
+        with self.lock:
+            for message_id in MESSAGE_ID.findall(text):
+                if message_id in self.sent and message_id not in self.first_audio:
+                    self.first_audio[message_id] = now - self.sent[message_id]
+
+    def latencies(self):
+        with self.lock:
+            return sorted(self.first_audio.values())
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, owner):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.owner = owner
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ChzzkApiHandler(JSONHandler):
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.endswith('/live-status'):
+            self.send_json({"content": {"chatChannelId": "bench-channel"}})
+        elif path.endswith('/getUserStatus'):
+            self.send_json({"content": {"userIdHash": "bench-user"}})
+        elif path.endswith('/access-token'):
+            self.send_json({"content": {"accessToken": "bench-token", "extraToken": "bench-extra"}})
+        else:
+            self.send_json({"content": {"channelName": "bench"}})
+
+
+class FakeChzzkApi:
+    def __init__(self):
+        self.server = FakeHTTPServer(ChzzkApiHandler, self)
+        self.url = self.server.url
+
+
+class OllamaHandler(JSONHandler):
+    def do_POST(self):
+        owner = self.server.owner
+        body = self.read_json()
+        owner.calls += 1
+
+        # 마지막 user 메시지에 들어 있는 채팅 번호를 응답 맨 앞에 붙여서 재생 시점을 추적할 수 있게 한다
+        ids = " ".join(MESSAGE_ID.findall(body['messages'][-1]['content']))
+        text = f"{ids} {owner.response_text}".strip()
+        time.sleep(owner.first_token_latency)
+
+        if not body.get('stream', True):
+            time.sleep(owner.token_interval * len(text) / 3)
+            self.send_json({"model": body.get('model'), "created_at": "2024-01-01T00:00:00Z",
+                            "message": {"role": "assistant", "content": text}, "done": True,
+                            "done_reason": "stop"})
+            return
+
+        # HTTP/1.0 연결 종료로 끝을 알리는 ndjson 스트림
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        for start in range(0, len(text), 3):
+            part = {"model": body.get('model'), "created_at": "2024-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": text[start:start + 3]}, "done": False}
+            self.wfile.write(json.dumps(part).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            time.sleep(owner.token_interval)
+        done = {"model": body.get('model'), "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": ""}, "done": True, "done_reason": "stop"}
+        self.wfile.write(json.dumps(done).encode("utf-8") + b"\n")
+
+
+class FakeOllama:
+    def __init__(self, first_token_latency=0.3, token_interval=0.02,
+                 response_text="좋은 질문이에요! 저는 오늘도 신나게 방송하고 있어요. 다음에도 꼭 놀러 와주세요."):
+        self.first_token_latency = first_token_latency
+        self.token_interval = token_interval
+        self.response_text = response_text
+        self.calls = 0
+        self.server = FakeHTTPServer(OllamaHandler, self)
+        self.url = self.server.url
+
+
+class ElevenLabsHandler(JSONHandler):
+    def do_POST(self):
+        owner = self.server.owner
+        body = self.read_json()
+        owner.calls += 1
+        output_format = parse_qs(urlparse(self.path).query).get('output_format', ['pcm_24000'])[0]
+        sample_rate = int(output_format.split('_')[1])
+
+        # 글자 수에 비례하는 길이의 무음 PCM을 실시간보다 빠르게 흘려보낸다
+        duration = max(0.3, len(body.get('text', '')) * owner.seconds_per_char)
+        audio = bytes(int(duration * sample_rate) * 2)
+        chunk_size = 4096
+        chunk_seconds = chunk_size / (sample_rate * 2)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/pcm')
+        self.send_header('Content-Length', str(len(audio)))
+        self.end_headers()
+        time.sleep(owner.first_byte_latency)
+        for start in range(0, len(audio), chunk_size):
+            self.wfile.write(audio[start:start + chunk_size])
+            self.wfile.flush()
+            time.sleep(chunk_seconds / owner.realtime_factor)
+
+
+class FakeElevenLabs:
+    def __init__(self, first_byte_latency=0.25, seconds_per_char=0.07, realtime_factor=4.0):
+        self.first_byte_latency = first_byte_latency
+        self.seconds_per_char = seconds_per_char
+        self.realtime_factor = realtime_factor
+        self.calls = 0
+        self.server = FakeHTTPServer(ElevenLabsHandler, self)
+        self.url = self.server.url + "/v1/text-to-speech/{voice_id}/stream"
+
+
+class FakeChzzkChat:
+    """치지직 채팅 웹소켓 서버. 연결한 클라이언트에게 정해진 속도로 채팅/후원 프레임을 보낸다."""
+
+    def __init__(self, tracker, rate=1.0, users=200, donation_ratio=0.02, ping_interval=20):
+        self.tracker = tracker
+        self.rate = rate
+        self.users = users
+        self.donation_ratio = donation_ratio
+        self.ping_interval = ping_interval
+        self.clients = set()
+        self.sending = threading.Event()
+        self.sent = 0
+        self.ready = threading.Event()
+        self.port = None
+        threading.Thread(target=lambda: asyncio.run(self.main()), daemon=True).start()
+        self.ready.wait()
+        self.url = f"ws://127.0.0.1:{self.port}"
+
+    async def main(self):
+        async with websockets.serve(self.handler, "127.0.0.1", 0) as server:
+            self.port = next(iter(server.sockets)).getsockname()[1]
+            self.ready.set()
+            await asyncio.gather(self.produce(), self.ping())
+
+    async def handler(self, sock, path=None):
+        self.clients.add(sock)
+        try:
+            async for raw_message in sock:
+                frame = json.loads(raw_message)
+                if frame['cmd'] == CHZZK_CHAT_CMD['connect']:
+                    await sock.send(json.dumps({"cmd": 10100, "retCode": 0, "bdy": {"sid": "bench-sid"}}))
+                elif frame['cmd'] == CHZZK_CHAT_CMD['request_recent_chat']:
+                    await sock.send(json.dumps({"cmd": CHZZK_CHAT_CMD['recent_chat'], "bdy": {"messageList": []}}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(sock)
+
+    def make_chat(self):
+        uid = f"viewer{random.randrange(self.users)}"
+        profile = json.dumps({"nickname": f"시청자{uid[6:]}"}, ensure_ascii=False)
+        message = self.tracker.new_message(random.choice(QUESTIONS))
+        return {"uid": uid, "profile": profile, "msg": message, "msgTime": int(time.time() * 1000)}
+
+    async def produce(self, tick=0.1):
+        owed = 0.0
+        while True:
+            await asyncio.sleep(tick)
+            if not self.sending.is_set() or not self.clients:
+                continue
+            owed += self.rate * tick
+            count, owed = int(owed), owed - int(owed)
+            for _ in range(count):
+                cmd = CHZZK_CHAT_CMD['donation'] if random.random() < self.donation_ratio else CHZZK_CHAT_CMD['chat']
+                frame = json.dumps({"cmd": cmd, "bdy": [self.make_chat()]}, ensure_ascii=False)
+                self.sent += 1
+                for sock in list(self.clients):
+                    await sock.send(frame)
+
+    async def ping(self):
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            for sock in list(self.clients):
+                await sock.send(json.dumps({"ver": "2", "cmd": CHZZK_CHAT_CMD['ping']}))
+
+
+class FakeYoutubeChat:
+    """pytchat.create()가 돌려주는 객체 대신 쓰는 가짜 유튜브 채팅."""
+
+    def __init__(self, tracker, sending, rate=0.5, users=200, poll_interval=1.0):
+        self.tracker = tracker
+        self.sending = sending
+        self.rate = rate
+        self.users = users
+        self.poll_interval = poll_interval
+        self.owed = 0.0
+        self.sent = 0
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+    def get(self):
+        time.sleep(self.poll_interval)
+        items = []
+        if self.sending.is_set():
+            self.owed += self.rate * self.poll_interval
+            count, self.owed = int(self.owed), self.owed - int(self.owed)
+            for _ in range(count):
+                items.append(SimpleNamespace(
+                    datetime=time.strftime('%Y-%m-%d %H:%M:%S'),
+                    author=SimpleNamespace(name=f"yt{random.randrange(self.users)}"),
+                    message=self.tracker.new_message(random.choice(QUESTIONS)),
+                ))
+            self.sent += len(items)
+        return SimpleNamespace(items=items, sync_items=lambda: items)
+
+
+class FakeTranslator:
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.calls = 0
+
+    def translate(self, text):
+        self.calls += 1
+        time.sleep(self.latency)
+        return text
+
+
+class NullAudioPlayer:
+    """소리를 내지 않고, 재생 시간만큼 기다리면서 첫 소리가 나는 시점을 기록하는 출력 장치."""
+
+    def __init__(self, tracker, sample_rate, speed=1.0):
+        self.tracker = tracker
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.played_seconds = 0.0
+
+    def play(self, speech):
+        first = True
+        for chunk in speech.chunks():
+            if first:
+                self.tracker.heard(speech.text)
+                first = False
+            seconds = len(chunk) / (self.sample_rate * 2)
+            self.played_seconds += seconds
+            time.sleep(seconds / self.speed)
+
+    def close(self):
+        pass
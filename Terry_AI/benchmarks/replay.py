@@ -0,0 +1,302 @@
+# benchmarks/replay.py
+# 방송 중에 남은 chat.log / chat_log.txt를 다시 흘려 넣어서, 채팅 속도를 올려가며 지연이 터지는 지점을 찾는다.
+#
+#   python benchmarks/replay.py --chat_log chat.log --youtube_log chat_log.txt --speeds 1,2,4,8 --round_seconds 60
+#   python benchmarks/replay.py --offline --background 1 --raid 20:150:10 --donation_storm 40:30:20
+#
+# --offline이면 bench_pipeline과 같은 가짜 ollama/ElevenLabs로 돌고, 아니면 config.json의 실제 ollama/ElevenLabs를 쓴다.
+# 어느 쪽이든 유저 기록, 장기 기억, TTS 캐시, 채팅 로그는 임시 작업 폴더에만 남고 끝나면 지운다.
+# (실제 모드는 TTS 캐시가 비어서 시작하므로 보낸 만큼 ElevenLabs 사용량이 나간다)
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import shutil
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# get_logger()가 남기는 줄: [2024-05-01 21:03:11][채팅] 닉네임 : 메시지
+CHAT_LOG_LINE = re.compile(r'^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)\]\[(채팅|후원)\] (.*?) : (.*)$')
+# log_chat()이 남기는 유튜브 줄: 2024-05-01 21:03:11 [닉네임]: 메시지 (Terry: ... 줄은 건너뛴다)
+YOUTUBE_LOG_LINE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) \[(.+?)\]: (.*)$')
+
+BACKGROUND_MESSAGES = ["테리 몇 살이에요?", "오늘 무슨 게임 해요?", "저녁 뭐 먹었어요?", "어제 방송 재밌었어요",
+                       "테리 최애 음식은 뭐예요?", "이 게임 어려워요?"]
+RAID_MESSAGES = ["레이드 왔어요!", "안녕하세요 테리님", "하이하이", "ㅋㅋㅋㅋㅋ", "테리 귀여워요", "처음 왔어요", "와 사람 많다"]
+DONATION_MESSAGES = ["테리 맛있는 거 사드세요!", "오늘 방송 최고예요", "노래 한 곡 부탁해요", "테리 MBTI 알려주세요",
+                     "생일 축하해요 테리", "응원합니다!"]
+
+
+def parse_time(text):
+    return datetime.strptime(text, '%Y-%m-%d %H:%M:%S').timestamp()
+
+
+def load_chat_log(path):
+    events = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = CHAT_LOG_LINE.match(line.rstrip("\r\n"))
+            if match:
+                time_text, chat_type, author, message = match.groups()
+                events.append({"time": parse_time(time_text), "author": author, "message": message,
+                               "platform": "Chzzk", "chat_type": chat_type})
+    return events
+
+
+def load_youtube_log(path):
+    events = []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = YOUTUBE_LOG_LINE.match(line.rstrip("\r\n"))
+            if match:
+                time_text, author, message = match.groups()
+                events.append({"time": parse_time(time_text), "author": author, "message": message,
+                               "platform": "YouTube", "chat_type": "채팅"})
+    return events
+
+
+def to_timeline(events, max_gap):
+    """절대 시각을 0부터 시작하는 초로 바꾼다. 방송을 껐다 켠 사이처럼 긴 공백은 max_gap초로 줄인다."""
+    events.sort(key=lambda event: event["time"])
+    timeline = []
+    offset = 0.0
+    previous = None
+    for event in events:
+        if previous is not None:
+            offset += min(event["time"] - previous, max_gap)
+        previous = event["time"]
+        timeline.append(dict(event, offset=offset))
+    return timeline
+
+
+OPENERS = ["", "테리님", "와", "근데", "혹시", "ㅎㅇ", "저기", "아"]
+ENDINGS = ["", "ㅋㅋ", "!!", "궁금해요", "ㅎㅎ", "알려줘요", "?", "~"]
+
+
+def vary(message):
+    """고정 문장에 앞뒤 말을 붙여서 같은 문장이 줄줄이 나오지 않게 한다."""
+    return " ".join(part for part in (random.choice(OPENERS), message, random.choice(ENDINGS)) if part)
+
+
+def background(rate, duration, users):
+    """로그가 없을 때 쓰는 일정한 속도의 평범한 채팅."""
+    count = int(rate * duration)
+    return [{"offset": i / rate, "author": f"viewer{random.randrange(users)}",
+             "message": vary(random.choice(BACKGROUND_MESSAGES)), "platform": "Chzzk", "chat_type": "채팅",
+             "synthetic": True}
+            for i in range(count)]
+
+
+def burst(spec, messages, chat_type, prefix):
+    """'시작초:개수:지속초' 형식. 매번 다른 새 시청자들이 짧은 시간에 몰려서 채팅한다."""
+    start, count, duration = spec.split(":")
+    start, count, duration = float(start), int(count), float(duration)
+    return [{"offset": start + random.random() * duration, "author": f"{prefix}{i}",
+             "message": vary(random.choice(messages)), "platform": "Chzzk", "chat_type": chat_type,
+             "synthetic": True}
+            for i in range(count)]
+
+
+def build_events(args):
+    events = []
+    if args.chat_log:
+        events += load_chat_log(args.chat_log)
+    if args.youtube_log:
+        events += load_youtube_log(args.youtube_log)
+    timeline = to_timeline(events, args.max_gap)
+
+    length = timeline[-1]["offset"] if timeline else 0.0
+    if args.background:
+        timeline += background(args.background, max(length, args.round_seconds), args.users)
+    for spec in args.raid:
+        timeline += burst(spec, RAID_MESSAGES, "채팅", "raider")
+    for spec in args.donation_storm:
+        timeline += burst(spec, DONATION_MESSAGES, "후원", "donor")
+    timeline.sort(key=lambda event: event["offset"])
+    return timeline
+
+
+class Replayer:
+    """로그 시간축을 speed배로 줄여서 채팅을 ChatBot(필터부터) 또는 파이프라인 대기열(바로)에 넣는다."""
+
+    def __init__(self, chatbot, events, target="chatbot"):
+        self.chatbot = chatbot
+        self.events = events
+        self.target = target
+        self.cursor = 0
+        self.clock = 0.0        # 로그 시간축에서 다음 단계가 시작할 위치
+        self.loop_offset = 0.0  # 로그를 다 쓰면 처음부터 다시 돈다
+        self.loops = 0
+        self.sent_total = 0
+
+    def message_of(self, event):
+        """
+        보낼 때마다 "#번호"를 붙여서 같은 채팅이 두 번 나가지 않게 한다.
+        로그를 한 바퀴 돌거나 배속을 올리면 같은 문장이 도배 검사 시간 안에 다시 나오고,
+        가짜 ollama도 같은 대답만 돌려줘서 필터와 중복 대답 검사만 재게 된다.
+        실제 로그는 처음 한 바퀴는 그대로 보낸다.
+        """
+        self.sent_total += 1
+        if event.get("synthetic") or self.loops:
+            return f"{event['message']} #{self.sent_total}"
+        return event["message"]
+
+    def send(self, event):
+        message = self.message_of(event)
+        if self.target == "ingest":
+            self.chatbot.pipeline.submit({
+                "author": event["author"],
+                "message": message,
+                "language": self.chatbot.detect_language(message),
+                "platform": event["platform"],
+                "channel": None,
+                "chat_type": event["chat_type"],
+                "priority": self.chatbot.chat_priority(event["author"], message, event["chat_type"]),
+                "received_at": time.time(),
+            })
+        else:
+            self.chatbot.handle_message(event["author"], message,
+                                        self.chatbot.detect_language(message), event["platform"],
+                                        chat_type=event["chat_type"])
+
+    def run_round(self, speed, seconds, on_tick=None):
+        """seconds초 동안 speed배속으로 보낸다. 보낸 채팅 수를 돌려준다."""
+        started = time.monotonic()
+        sent = 0
+        last_tick = started
+        while True:
+            now = time.monotonic()
+            elapsed = now - started
+            if elapsed >= seconds:
+                self.clock += seconds * speed
+                return sent
+            if on_tick and now - last_tick >= 0.5:
+                on_tick()
+                last_tick = now
+
+            event = self.events[self.cursor]
+            event_time = self.loop_offset + event["offset"]
+            due = (event_time - self.clock) / speed
+            if due > elapsed:
+                time.sleep(min(due - elapsed, 0.1))
+                continue
+
+            self.send(event)
+            sent += 1
+            self.cursor += 1
+            if self.cursor == len(self.events):
+                self.cursor = 0
+                self.loops += 1
+                self.loop_offset = event_time + 1.0
+
+
+def round_report(metrics, speed, sent, seconds, max_depth):
+    snapshot = metrics.snapshot()
+    counters = snapshot["counters"]
+    histograms = snapshot["histograms"]
+    latency = histograms.get("terry_chat_to_audio_seconds", {})
+    dropped = {name[len('terry_chat_dropped_total{reason="'):-2]: value
+               for name, value in counters.items() if name.startswith("terry_chat_dropped_total")}
+    batch = histograms.get("terry_batch_size", {})
+    return {
+        "speed": speed,
+        "offered_per_second": round(sent / seconds, 2),
+        "sent": sent,
+        "answered": latency.get("count", 0),
+        "dropped": dropped,
+        "drop_rate": round(sum(dropped.values()) / sent, 4) if sent else 0.0,
+        "llm_calls": counters.get("terry_llm_calls_total", 0),
+        "batch_mean": batch.get("mean"),
+        "latency_p50": latency.get("p50"),
+        "latency_p90": latency.get("p90"),
+        "latency_p99": latency.get("p99"),
+        "max_ingest_depth": max_depth,
+    }
+
+
+def main(args):
+    events = build_events(args)
+    if not events:
+        print("보낼 채팅이 없습니다. --chat_log, --youtube_log, --background 중 하나는 필요합니다.")
+        return
+
+    report = sys.stdout
+    if args.offline:
+        from bench_pipeline import start_offline
+        from fakes import LatencyTracker, FakeTranslator, NullAudioPlayer
+        terry, _, _, workdir = start_offline()
+    else:
+        # 실제 ollama/ElevenLabs를 쓰더라도 방송용 user_data, tts_cache, chat_log.txt에는 쓰지 않는다
+        from bench_pipeline import make_workdir
+        from terry_module import load_terry
+        workdir = make_workdir(fake_services=False)
+        os.chdir(workdir)
+        terry = load_terry()
+    from metrics import metrics
+
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        chatbot = terry.ChatBot()
+        if args.offline:
+            chatbot.player = NullAudioPlayer(LatencyTracker(), chatbot.tts.sample_rate)
+            chatbot.translator.translators['ko'] = FakeTranslator()
+
+        replayer = Replayer(chatbot, events, args.target)
+        print(f"채팅 {len(events)}개, 대상: {args.target}", file=report)
+        for speed in args.speeds:
+            metrics.reset()
+            depth = {"max": 0}
+
+            def sample():
+                depth["max"] = max(depth["max"], chatbot.pipeline.ingest_queue.qsize())
+
+            sent = replayer.run_round(speed, args.round_seconds, sample)
+            deadline = time.monotonic() + args.drain
+            while time.monotonic() < deadline and not chatbot.pipeline.is_idle():
+                sample()
+                time.sleep(0.2)
+
+            result = round_report(metrics, speed, sent, args.round_seconds, depth["max"])
+            print(" ".join(f"{name}={value}" for name, value in result.items()), file=report)
+
+            p90 = result["latency_p90"]
+            if (p90 is not None and p90 > args.slo) or result["drop_rate"] > args.max_drop_rate:
+                print(f"{speed}배속 (초당 {result['offered_per_second']}개)부터 지연/누락이 기준을 넘었습니다.", file=report)
+                if not args.keep_going:
+                    break
+
+    chatbot.long_term_memory.close()
+    chatbot.user_memory.close()
+    os.chdir(ROOT)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chat_log', type=str, default=None, help='get_logger가 남긴 chat.log')
+    parser.add_argument('--youtube_log', type=str, default=None, help='log_chat이 남긴 chat_log.txt')
+    parser.add_argument('--background', type=float, default=0.0, help='로그 대신/함께 보낼 초당 평범한 채팅 수')
+    parser.add_argument('--raid', action='append', default=[], help='시작초:개수:지속초 (로그 시간 기준, 여러 번 가능)')
+    parser.add_argument('--donation_storm', action='append', default=[], help='시작초:개수:지속초')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--max_gap', type=float, default=10.0, help='로그에서 이보다 긴 공백은 줄인다(초)')
+    parser.add_argument('--speeds', type=lambda text: [float(s) for s in text.split(",")], default=[1.0],
+                        help='단계별 배속, 예: 1,2,4,8')
+    parser.add_argument('--round_seconds', type=float, default=60, help='단계마다 채팅을 보내는 시간(초)')
+    parser.add_argument('--drain', type=float, default=60, help='단계가 끝나고 남은 응답을 기다리는 최대 시간(초)')
+    parser.add_argument('--target', choices=["chatbot", "ingest"], default="chatbot",
+                        help='chatbot: handle_message(필터 포함), ingest: 파이프라인 대기열에 바로')
+    parser.add_argument('--slo', type=float, default=5.0, help='채팅부터 첫 소리까지 p90 허용 시간(초)')
+    parser.add_argument('--max_drop_rate', type=float, default=0.5, help='이보다 많이 버려지면 한계로 본다')
+    parser.add_argument('--keep_going', action='store_true', help='한계를 넘어도 남은 배속을 계속 돌린다')
+    parser.add_argument('--offline', action='store_true', help='가짜 ollama/ElevenLabs로 돌린다')
+    parser.add_argument('--verbose', action='store_true', help='Terry 출력을 그대로 보여준다')
+    main(parser.parse_args())
@@ -0,0 +1,121 @@
+# chat_filter.py
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque, Counter
+
+REPEATED_CHARS = re.compile(r'(.)\1{2,}')          # ㅋㅋㅋㅋㅋ -> ㅋㅋ
+REPEATED_PAIRS = re.compile(r'(..)\1{2,}')         # 하하하하 -> 하하
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """이모지/기호를 지우고, 반복 글자와 공백을 줄여서 비교하기 좋은 형태로 만든다."""
+    text = unicodedata.normalize('NFC', text).lower()
+    text = ''.join(ch for ch in text if not unicodedata.category(ch).startswith(('S', 'C')) or ch.isspace())
+    text = REPEATED_CHARS.sub(r'\1\1', text)
+    text = REPEATED_PAIRS.sub(r'\1', text)
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def shingles(text, size=3):
+    compact = text.replace(' ', '')
+    if len(compact) <= size:
+        return {compact}
+    return {compact[i:i + size] for i in range(len(compact) - size + 1)}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate  # 초당 채워지는 토큰 수
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class ChatFilter:
+    """
+    LLM에 넘기기 전에 도는 가벼운 필터.
+    정규화한 문장을 최근 메시지들과 shingle Jaccard 유사도로 비교해 도배/복붙을 거르고,
+    유저별/플랫폼별 토큰 버킷으로 한 사람이 LLM을 독점하지 못하게 한다.
+    여러 채널을 한 번에 받을 때는 채널마다 최근 메시지와 버킷을 따로 둬서, 한 채널의 도배나 레이드가
+    다른 채널의 채팅까지 막지 않는다.
+    """
+
+    def __init__(self, window_size=50, window_seconds=30, similarity=0.8,
+                 user_rate=0.2, user_burst=2, platform_rate=2.0, platform_burst=10, max_users=10000):
+        self.window_size = window_size
+        self.windows = {}  # (플랫폼, 채널) -> deque[(시간, shingle 집합)]
+        self.window_seconds = window_seconds
+        self.similarity = similarity
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.platform_rate = platform_rate
+        self.platform_burst = platform_burst
+        self.max_users = max_users
+        self.user_buckets = OrderedDict()
+        self.platform_buckets = {}  # (플랫폼, 채널) -> TokenBucket
+        self.dropped = Counter()
+        self.lock = threading.Lock()
+
+    def check(self, author, message, platform, channel=None):
+        """걸러야 하면 이유를 문자열로, 통과하면 None을 돌려준다."""
+        with self.lock:
+            reason = self.find_reason(author, message, (platform, channel))
+            if reason:
+                self.dropped[reason] += 1
+            return reason
+
+    def find_reason(self, author, message, source):
+        text = normalize(message)
+        if not text:
+            return "empty"
+
+        now = time.monotonic()
+        window = self.windows.get(source)
+        if window is None:
+            window = self.windows[source] = deque(maxlen=self.window_size)
+        while window and now - window[0][0] > self.window_seconds:
+            window.popleft()
+
+        current = shingles(text)
+        duplicate = any(self.jaccard(current, previous) >= self.similarity for _, previous in window)
+        window.append((now, current))
+        if duplicate:
+            return "duplicate"
+
+        # 닉네임은 채널마다 다른 사람일 수 있으니 채널까지 붙여서 센다
+        if not self.user_bucket((source, author)).allow():
+            return "user_rate"
+
+        bucket = self.platform_buckets.get(source)
+        if bucket is None:
+            bucket = self.platform_buckets[source] = TokenBucket(self.platform_rate, self.platform_burst)
+        if not bucket.allow():
+            return "platform_rate"
+        return None
+
+    def user_bucket(self, author):
+        bucket = self.user_buckets.get(author)
+        if bucket is None:
+            bucket = self.user_buckets[author] = TokenBucket(self.user_rate, self.user_burst)
+            if len(self.user_buckets) > self.max_users:
+                self.user_buckets.popitem(last=False)
+        else:
+            self.user_buckets.move_to_end(author)
+        return bucket
+
+    @staticmethod
+    def jaccard(a, b):
+        return len(a & b) / len(a | b)
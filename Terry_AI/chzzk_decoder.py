@@ -0,0 +1,94 @@
+# chzzk_decoder.py
+
+import time
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    import json
+    loads = json.loads
+
+from cmd_type import CHZZK_CHAT_CMD
+
+CHAT_TYPES = {
+    CHZZK_CHAT_CMD['chat']: '채팅',
+    CHZZK_CHAT_CMD['donation']: '후원',
+}
+ANONYMOUS_NICKNAME = '익명의 후원자'
+
+
+class ChatRecord:
+    """채팅 한 건. dict 대신 __slots__를 써서 메시지마다 만드는 비용과 메모리를 줄인다."""
+
+    __slots__ = ('uid', 'nickname', 'message', 'msg_time', 'chat_type')
+
+    def __init__(self, uid, nickname, message, msg_time, chat_type):
+        self.uid = uid
+        self.nickname = nickname
+        self.message = message
+        self.msg_time = msg_time
+        self.chat_type = chat_type
+
+    @property
+    def key(self):
+        return (self.uid, self.msg_time)
+
+
+class ChzzkDecoder:
+    """
+    치지직 웹소켓 프레임 디코더.
+    orjson이 있으면 그걸로 파싱하고, bdy 배열을 한 번에 ChatRecord 목록으로 바꾼다.
+    profile JSON은 uid별로 캐시해서 같은 시청자의 닉네임을 매번 다시 파싱하지 않는다.
+    """
+
+    def __init__(self, max_profiles=5000):
+        self.profiles = {}  # uid -> (profile 문자열, nickname)
+        self.max_profiles = max_profiles
+        self.last_second = None
+        self.last_time_text = ''
+
+    def decode(self, raw_message):
+        """프레임 하나를 (cmd, ChatRecord 목록)으로 바꾼다. 채팅이 아닌 프레임은 빈 목록."""
+        frame = loads(raw_message)
+        chat_cmd = frame['cmd']
+
+        chat_type = CHAT_TYPES.get(chat_cmd)
+        if chat_type is not None:
+            return chat_cmd, [
+                ChatRecord(data['uid'], self.nickname(data['uid'], data.get('profile')),
+                           data.get('msg', ''), data['msgTime'], chat_type)
+                for data in frame['bdy']
+            ]
+
+        if chat_cmd == CHZZK_CHAT_CMD['recent_chat']:
+            # 최근 채팅 응답은 필드 이름이 다르다 (userId, content, messageTime, messageTypeCode)
+            return chat_cmd, [
+                ChatRecord(data['userId'], self.nickname(data['userId'], data.get('profile')),
+                           data.get('content', ''), data['messageTime'],
+                           '후원' if data.get('messageTypeCode') == 10 else '채팅')
+                for data in frame['bdy'].get('messageList', [])
+            ]
+
+        return chat_cmd, []
+
+    def nickname(self, uid, profile):
+        if uid == 'anonymous':
+            return ANONYMOUS_NICKNAME
+        cached = self.profiles.get(uid)
+        if cached is not None and cached[0] == profile:
+            return cached[1]
+
+        nickname = loads(profile)["nickname"]
+        if len(self.profiles) >= self.max_profiles:
+            self.profiles.clear()
+        self.profiles[uid] = (profile, nickname)
+        return nickname
+
+    def format_time(self, msg_time):
+        """msgTime(ms)을 로그용 문자열로. 같은 초 안의 메시지는 이전 결과를 그대로 쓴다."""
+        second = msg_time // 1000
+        if second != self.last_second:
+            self.last_second = second
+            self.last_time_text = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(second))
+        return self.last_time_text
@@ -6,6 +6,7 @@ CHZZK_CHAT_CMD = {
     'connect'             : 100,
     'send_chat'           : 3101,
     'request_recent_chat' : 5101,
+    'recent_chat'         : 15101,
     'chat'                : 93101,
     'donation'            : 93102,
 }
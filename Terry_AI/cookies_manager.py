@@ -1,40 +1,202 @@
 # cookies_manager.py
 
 import json
+import threading
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 
-class CookiesManager:
-    def __init__(self):
-        self.cookies_file = "cookies.json"
-        self.url = 'https://chzzk.naver.com/live/34edb106b3fba99451c269a95a39c49a'
-        self.update_interval = 600  # 10분마다 갱신
+import requests
 
-    def update_cookies(self):
+import api
+from api import fetch_userIdHash
+from metrics import metrics
+
+COOKIES_FILE = "cookies.json"
+LOGIN_URL = 'https://chzzk.naver.com/live/34edb106b3fba99451c269a95a39c49a'
+
+
+def open_browser(url=LOGIN_URL):
+    """selenium/webdriver_manager는 import만 해도 느리므로, 브라우저가 정말 필요할 때만 불러온다."""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    options = webdriver.ChromeOptions()
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    driver.get(url)
+    return driver
+
+
+def read_login_cookies(driver):
+    cookies = driver.get_cookies()
+    nid_aut = next(cookie['value'] for cookie in cookies if cookie['name'] == 'NID_AUT')
+    nid_ses = next(cookie['value'] for cookie in cookies if cookie['name'] == 'NID_SES')
+    return {
+        "NID_AUT": nid_aut,
+        "NID_SES": nid_ses
+    }
+
+
+def load_cookies(cookies_file=COOKIES_FILE):
+    try:
+        with open(cookies_file, "r", encoding='utf-8') as json_file:
+            return json.load(json_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cookies(cookies, cookies_file=COOKIES_FILE):
+    with open(cookies_file, "w", encoding='utf-8') as json_file:
+        json.dump(cookies, json_file, indent=4, ensure_ascii=False)
+
+
+def validate_cookies(cookies):
+    """
+    저장된 쿠키로 로그인 상태를 한 번 확인한다. 로그인돼 있으면 userIdHash, 만료됐으면 None.
+    401/403이나 userIdHash가 비어 있을 때만 만료로 보고, 타임아웃/DNS/5xx 같은 네트워크 오류는
+    requests.RequestException 그대로 올려서 호출한 쪽이 지금 쿠키를 버리지 않게 한다.
+    """
+    if not cookies.get("NID_AUT") or not cookies.get("NID_SES"):
+        return None
+    try:
+        return fetch_userIdHash(cookies) or None
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code in (401, 403):
+            return None
+        raise
+    except (KeyError, TypeError):
+        # 로그아웃 상태면 content나 userIdHash가 비어서 온다
+        return None
+
+
+def check_login(cookies, attempts=3, delay=2.0):
+    """
+    validate_cookies를 네트워크 오류일 때만 몇 번 다시 시도한다.
+    끝까지 실패하면 예외를 그대로 올린다. 이때 쿠키를 버리고 브라우저 로그인으로 넘어가지 않는다.
+    """
+    for attempt in range(attempts):
         try:
-            options = webdriver.ChromeOptions()
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-            driver.get(self.url)
-            input("로그인 후 Enter를 눌러주세요...")
+            return validate_cookies(cookies)
+        except requests.RequestException as e:
+            if attempt == attempts - 1:
+                raise
+            print(f"로그인 상태 확인 실패 ({e}), {delay}초 후 다시 시도합니다.")
+            time.sleep(delay)
+
+
+def login_with_browser(cookies_file=COOKIES_FILE):
+    """크롬을 띄워 직접 로그인 받고, 새 쿠키를 저장해서 돌려준다."""
+    driver = open_browser()
+    try:
+        input("로그인 후 Enter를 눌러주세요...")
+        cookies = read_login_cookies(driver)
+    finally:
+        driver.quit()
+    save_cookies(cookies, cookies_file)
+    print("쿠키 갱신 완료!")
+    return cookies
 
-            while True:
-                cookies = driver.get_cookies()
-                nid_aut = next(cookie['value'] for cookie in cookies if cookie['name'] == 'NID_AUT')
-                nid_ses = next(cookie['value'] for cookie in cookies if cookie['name'] == 'NID_SES')
 
-                updated_cookies = {
-                    "NID_AUT": nid_aut,
-                    "NID_SES": nid_ses
-                }
+def ensure_login(cookies, cookies_file=COOKIES_FILE):
+    """쿠키가 유효하면 그대로 쓰고, 만료됐을 때만 브라우저로 로그인한다. (cookies, userIdHash)를 돌려준다."""
+    userIdHash = check_login(cookies)
+    if userIdHash is None:
+        print("저장된 쿠키가 없거나 만료되어 브라우저로 로그인합니다.")
+        cookies = login_with_browser(cookies_file)
+        userIdHash = fetch_userIdHash(cookies)
+    return cookies, userIdHash
 
-                with open(self.cookies_file, "w", encoding='utf-8') as json_file:
-                    json.dump(updated_cookies, json_file, indent=4, ensure_ascii=False)
 
-                print("쿠키 갱신 완료!")
-                time.sleep(self.update_interval)
+class CredentialRefresher(threading.Thread):
+    """
+    봇 프로세스 안에서 로그인 쿠키와 accessToken을 관리하는 스레드.
+    check_interval마다 쿠키가 아직 유효한지 한 번 확인하고, 만료됐을 때만
+    cookies.json(다른 곳에서 새로 로그인했을 수 있음) → 브라우저 로그인 순서로 새 쿠키를 구한다.
+    새 쿠키는 attach된 객체(ChzzkChat, ChannelStatusPoller 등)의 .cookies와 api.session에 바로 넣으므로
+    웹소켓은 끊기지 않고 다음 요청부터 새 쿠키를 쓴다.
+    accessToken은 연결할 때만 쓰므로, 만료 token_margin초 전에 미리 받아두어 재연결이 기다리지 않게 한다.
+    """
 
+    def __init__(self, cookies, cookies_file=COOKIES_FILE, check_interval=300, token_margin=300,
+                 interactive=True, tick=10):
+        super().__init__(name="credential-refresher", daemon=True)
+        self.cookies = cookies
+        self.cookies_file = cookies_file
+        self.check_interval = check_interval
+        self.token_margin = token_margin
+        self.interactive = interactive
+        self.tick = tick
+        self.targets = []
+        self.chats = []
+        self.last_check = time.time()
+        self.stop_event = threading.Event()
+
+    def attach(self, target):
+        """target.cookies를 항상 최신 쿠키로 유지한다."""
+        target.cookies = self.cookies
+        self.targets.append(target)
+
+    def attach_chat(self, chat):
+        """chat.token_time을 보고 accessToken을 미리 갱신한다. chat은 renew_token()을 가져야 한다."""
+        self.attach(chat)
+        self.chats.append(chat)
+
+    def run(self):
+        while not self.stop_event.wait(self.tick):
+            try:
+                if time.time() - self.last_check >= self.check_interval:
+                    self.last_check = time.time()
+                    self.check_session()
+                self.refresh_tokens()
+            except Exception as e:
+                print(f"인증 정보 갱신 중 오류: {e}")
+
+    def check_session(self):
+        try:
+            if validate_cookies(self.cookies):
+                return
+            saved = load_cookies(self.cookies_file)
+            saved_valid = saved != self.cookies and validate_cookies(saved)
+        except requests.RequestException as e:
+            # 네트워크 문제일 뿐 쿠키가 만료된 것은 아니므로 지금 쿠키를 유지하고 다음 주기에 다시 확인한다
+            print(f"로그인 상태를 확인하지 못했습니다 (다음 주기에 다시 확인): {e}")
+            return
+
+        if saved_valid:
+            print("cookies.json의 새 쿠키로 교체합니다.")
+            self.swap(saved)
+            return
+
+        if not self.interactive:
+            print("치지직 로그인 쿠키가 만료되었습니다. python cookies_manager.py로 다시 로그인해주세요.")
+            return
+        print("치지직 로그인 쿠키가 만료되어 브라우저로 다시 로그인합니다.")
+        self.swap(login_with_browser(self.cookies_file))
+
+    def swap(self, cookies):
+        self.cookies = cookies
+        for target in self.targets:
+            target.cookies = cookies
+        api.session.cookies.update(cookies)
+        metrics.inc("terry_credentials_swapped_total")
+
+    def refresh_tokens(self):
+        for chat in self.chats:
+            if time.time() - chat.token_time > chat.token_ttl - self.token_margin:
+                chat.renew_token()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class CookiesManager:
+    """브라우저로 한 번 로그인해서 cookies.json을 만든다. 실행 중 갱신은 CredentialRefresher가 맡는다."""
+
+    def __init__(self):
+        self.cookies_file = COOKIES_FILE
+
+    def update_cookies(self):
+        try:
+            login_with_browser(self.cookies_file)
         except Exception as e:
             print(f"Failed to update cookies: {e}")
 
@@ -1,29 +1,131 @@
+import atexit
+import copy
 import json
 import os
+import sqlite3
+import tempfile
+import threading
 
 class DatabaseManager:
-    def __init__(self, db_path):
+    """
+    유저 데이터를 메모리 dict에 들고 있다가 바뀐 것만 모아서 주기적으로 저장하는 매니저.
+    backend="json"이면 임시 파일에 쓰고 rename 해서 중간에 죽어도 파일이 깨지지 않고,
+    backend="sqlite"이면 바뀐 유저 행만 upsert 한다.
+    """
+
+    def __init__(self, db_path, backend="json", flush_interval=5.0):
         self.db_path = db_path
-        if not os.path.exists(self.db_path):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # 스냅샷을 뜨고 파일에 쓰는 동안 잡는다. 늦게 뜬 스냅샷을 쓰고 나서 먼저 뜬 스냅샷이 덮어쓰지 않게 한다
+        self.write_lock = threading.Lock()
+        self.dirty = set()
+        self.full_rewrite = False
+        self.conn = None
+
+        if self.backend == "sqlite":
+            self.init_sqlite()
+        elif not os.path.exists(self.db_path):
             self.init_database()
+        self.data = self.load_data()
+
+        self.stop_event = threading.Event()
+        self.flusher = threading.Thread(target=self.flush_loop, daemon=True)
+        self.flusher.start()
+        atexit.register(self.close)
 
     def init_database(self):
-        with open(self.db_path, 'w') as db_file:
-            json.dump({}, db_file)
+        self.write_json({})
+
+    def init_sqlite(self):
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+        self.conn.commit()
 
     def load_data(self):
-        with open(self.db_path, 'r') as db_file:
+        if self.backend == "sqlite":
+            return {user_id: json.loads(data) for user_id, data in self.conn.execute("SELECT user_id, data FROM users")}
+        with open(self.db_path, 'r', encoding='utf-8') as db_file:
             return json.load(db_file)
 
     def save_data(self, data):
-        with open(self.db_path, 'w') as db_file:
-            json.dump(data, db_file, indent=4)
+        with self.lock:
+            self.data = dict(data)
+            self.full_rewrite = True
+        self.flush()
 
     def get_user_data(self, user_id):
-        data = self.load_data()
-        return data.get(user_id, {})
+        # flush 스레드가 직렬화하는 dict를 밖에서 고치지 못하도록 복사본을 돌려준다
+        with self.lock:
+            return copy.deepcopy(self.data.get(user_id, {}))
 
     def save_user_data(self, user_id, user_data):
-        data = self.load_data()
-        data[user_id] = user_data
-        self.save_data(data)
+        user_data = copy.deepcopy(user_data)
+        with self.lock:
+            self.data[user_id] = user_data
+            self.dirty.add(user_id)
+
+    def flush(self):
+        """바뀐 내용이 있으면 디스크에 반영한다."""
+        with self.write_lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        """write_lock을 잡은 상태에서 호출한다. 유저 데이터 lock은 스냅샷을 뜰 때만 잡아서 파일 쓰기가 채팅 처리를 막지 않는다."""
+        with self.lock:
+            if not self.dirty and not self.full_rewrite:
+                return
+            full_rewrite = self.full_rewrite
+            dirty, self.dirty, self.full_rewrite = self.dirty, set(), False
+            if self.backend == "sqlite":
+                # 연결 하나를 flush 스레드와 close가 같이 쓰므로 lock 안에서만 쓴다
+                user_ids = self.data.keys() if full_rewrite else dirty
+                rows = [(user_id, json.dumps(self.data[user_id], ensure_ascii=False)) for user_id in user_ids]
+                with self.conn:
+                    if full_rewrite:
+                        self.conn.execute("DELETE FROM users")
+                    self.conn.executemany("INSERT OR REPLACE INTO users (user_id, data) VALUES (?, ?)", rows)
+                return
+            snapshot = json.dumps(self.data, ensure_ascii=False, separators=(',', ':'))
+
+        try:
+            self.write_json(snapshot)
+        except Exception:
+            # 쓰지 못한 변경을 잃지 않도록 다음 flush에서 전체를 다시 쓴다
+            with self.lock:
+                self.full_rewrite = True
+            raise
+
+    def write_json(self, data):
+        if not isinstance(data, str):
+            data = json.dumps(data)
+        directory = os.path.dirname(os.path.abspath(self.db_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as db_file:
+                db_file.write(data)
+                db_file.flush()
+                os.fsync(db_file.fileno())
+            os.replace(temp_path, self.db_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def flush_loop(self):
+        while not self.stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Failed to flush database: {e}")
+
+    def close(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.flusher.join()
+        self.flush()
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,78 @@
+# idle_scheduler.py
+
+import threading
+import time
+from collections import deque
+
+from metrics import metrics
+
+
+class IdleScheduler(threading.Thread):
+    """
+    채팅이 idle_seconds 동안 없고 Terry도 말하고 있지 않으면 혼잣말을 하게 하는 타이머 스레드.
+    소켓 수신과 상관없이 tick마다 깨어나므로 채팅이 완전히 조용해도 제때 동작한다.
+    파이프라인이 비어 있고 prepare_after초 이상 조용하면 그 사이에 LLM으로 혼잣말을 만들고
+    음성까지 합성해서 pool_size개까지 쌓아두기 때문에, 혼잣말은 바로 재생되고 채팅이 바쁠 때는 아무 비용도 없다.
+    """
+
+    def __init__(self, chatbot, idle_seconds=60, prepare_after=5, pool_size=3, tick=1.0, enabled=True):
+        super().__init__(name="idle", daemon=True)
+        self.chatbot = chatbot
+        self.idle_seconds = idle_seconds
+        self.prepare_after = prepare_after
+        self.pool_size = pool_size
+        self.tick = tick
+        self.enabled = enabled
+        self.pool = deque()  # {"text", "pcm"}
+        self.lock = threading.Lock()
+        self.last_activity = time.monotonic()
+        self.stop_event = threading.Event()
+
+    def touch(self):
+        """채팅이 들어왔거나 Terry가 말하는 중이면 조용한 시간을 처음부터 다시 센다."""
+        self.last_activity = time.monotonic()
+
+    def run(self):
+        while not self.stop_event.wait(self.tick):
+            if not self.enabled:
+                continue
+            if self.chatbot.is_playing_music or not self.chatbot.pipeline.is_idle():
+                self.touch()
+                continue
+
+            quiet = time.monotonic() - self.last_activity
+            try:
+                if quiet >= self.idle_seconds:
+                    self.chatbot.mutter_to_self()
+                    self.touch()
+                elif quiet >= self.prepare_after and len(self.pool) < self.pool_size:
+                    self.prepare()
+            except Exception as e:
+                print(f"혼잣말 준비 중 오류: {e}")
+
+    def prepare(self):
+        """혼잣말 하나를 만들고 PCM까지 받아서 pool에 넣는다."""
+        text = self.chatbot.generate_mutter(self.lines())
+        if not text or text in self.lines():
+            return
+        # 만드는 사이에 채팅이 들어왔으면 합성은 다음 조용한 때로 미룬다
+        if time.monotonic() - self.last_activity < self.prepare_after:
+            return
+        pcm = b"".join(self.chatbot.tts.open_stream(text).chunks())
+        if not pcm:
+            return
+        with self.lock:
+            self.pool.append({"text": text, "pcm": pcm})
+        metrics.inc("terry_idle_prepared_total")
+
+    def lines(self):
+        with self.lock:
+            return [entry["text"] for entry in self.pool]
+
+    def take(self):
+        """준비된 혼잣말을 하나 꺼낸다. 없으면 None."""
+        with self.lock:
+            return self.pool.popleft() if self.pool else None
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,114 @@
+# language.py
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from deep_translator import GoogleTranslator
+
+
+def detect_language(text):
+    """
+    글자 종류(한글/가나/한자/라틴) 비율로 언어를 추정한다. 네트워크나 모델 없이 바로 끝난다.
+    'ko', 'ja', 'zh', 'en', 'unknown' 중 하나를 돌려준다.
+    """
+    hangul = kana = han = latin = 0
+    for ch in text:
+        code = ord(ch)
+        if 0xAC00 <= code <= 0xD7A3 or 0x1100 <= code <= 0x11FF or 0x3130 <= code <= 0x318F:
+            hangul += 1
+        elif 0x3040 <= code <= 0x30FF:
+            kana += 1
+        elif 0x4E00 <= code <= 0x9FFF:
+            han += 1
+        elif ch.isalpha() and code < 0x250:
+            latin += 1
+
+    total = hangul + kana + han + latin
+    if total == 0:
+        return 'unknown'
+    if hangul / total >= 0.3:
+        return 'ko'
+    if kana:
+        return 'ja'
+    if han / total >= 0.3:
+        return 'zh'
+    return 'en'
+
+
+class CachedTranslator:
+    """
+    이미 목표 언어인 문장은 번역하지 않고, 번역 결과는 (문장, 목표 언어) 기준 LRU로 기억하는 번역기.
+    cache_path를 주면 디스크에 저장해 재시작 후에도 같은 문장은 다시 번역하지 않는다.
+    """
+
+    def __init__(self, max_entries=2000, cache_path=None, save_every=50):
+        self.max_entries = max_entries
+        self.cache_path = cache_path
+        self.save_every = save_every
+        self.cache = OrderedDict()
+        self.translators = {}
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        # 번역 단계, 혼잣말 생성, 종료 시 atexit가 동시에 저장할 수 있으므로 스냅샷부터 파일 교체까지 한 번에 하나만 한다
+        self.save_lock = threading.Lock()
+
+        if self.cache_path and os.path.exists(self.cache_path):
+            self.load()
+        if self.cache_path:
+            atexit.register(self.save)
+
+    def translate(self, text, target='ko'):
+        if not text.strip() or detect_language(text) == target:
+            return text
+
+        key = (text, target)
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        translator = self.translators.get(target)
+        if translator is None:
+            translator = self.translators[target] = GoogleTranslator(source='auto', target=target)
+        translated = translator.translate(text)
+
+        with self.lock:
+            self.cache[key] = translated
+            if len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+            self.unsaved += 1
+            should_save = self.cache_path and self.unsaved >= self.save_every
+        if should_save:
+            self.save()
+        return translated
+
+    def load(self):
+        """저장된 번역을 읽는다. 파일이 깨졌으면 빈 캐시로 시작한다 (다음 저장 때 덮어쓴다)."""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                for text, target, translated in json.load(file):
+                    self.cache[(text, target)] = translated
+        except (OSError, ValueError, TypeError) as e:
+            print(f"번역 캐시를 읽을 수 없어 비우고 시작합니다: {e}")
+            self.cache.clear()
+
+    def save(self):
+        if not self.cache_path:
+            return
+        with self.save_lock:
+            with self.lock:
+                entries = [[text, target, translated] for (text, target), translated in self.cache.items()]
+                self.unsaved = 0
+            directory = os.path.dirname(os.path.abspath(self.cache_path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as file:
+                    json.dump(entries, file, ensure_ascii=False)
+                os.replace(temp_path, self.cache_path)
+            except Exception:
+                os.remove(temp_path)
+                raise
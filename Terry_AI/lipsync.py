@@ -0,0 +1,225 @@
+# lipsync.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from websocket import create_connection
+
+from metrics import metrics
+
+
+def mouth_envelope(samples, hop, floor_db=-50.0, peak_db=-15.0):
+    """
+    int16 PCM을 hop 샘플씩 잘라 프레임마다 RMS를 구하고, dB로 바꿔 floor_db~peak_db를 0~1로 옮긴다.
+    반복문 없이 한 번에 계산한다. hop으로 나누어떨어지지 않는 뒷부분은 무시한다.
+    """
+    count = len(samples) // hop
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:count * hop].reshape(count, hop).astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    level = 20.0 * np.log10(np.maximum(rms, 1e-6))
+    return np.clip((level - floor_db) / (peak_db - floor_db), 0.0, 1.0)
+
+
+class VTubeStudioClient:
+    """VTube Studio 공개 API 클라이언트. 처음 한 번은 VTube Studio 화면에서 플러그인을 허용해야 한다."""
+
+    def __init__(self, url="ws://127.0.0.1:8001", plugin_name="Terry AI", developer="TALK_WITH_AI",
+                 token_path="vts_token.json", timeout=5, approval_timeout=60):
+        self.url = url
+        self.timeout = timeout
+        # 토큰 요청은 방송하는 사람이 VTube Studio에서 "허용"을 누를 때까지 응답이 오지 않는다
+        self.approval_timeout = approval_timeout
+        self.plugin = {"pluginName": plugin_name, "pluginDeveloper": developer}
+        self.token_path = token_path
+        self.ws = None
+        self.request_id = 0
+
+    def request(self, message_type, data=None):
+        self.request_id += 1
+        self.ws.send(json.dumps({
+            "apiName": "VTubeStudioPublicAPI",
+            "apiVersion": "1.0",
+            "requestID": str(self.request_id),
+            "messageType": message_type,
+            "data": data or {},
+        }))
+        response = json.loads(self.ws.recv())
+        if response.get("messageType") == "APIError":
+            raise RuntimeError(response["data"].get("message"))
+        return response.get("data", {})
+
+    def connect(self):
+        self.ws = create_connection(self.url, timeout=self.timeout)
+        try:
+            token = self.load_token()
+            if token is None or not self.authenticate(token):
+                # 저장된 토큰이 없거나 취소됐으면 새로 받는다 (VTube Studio에 허용 창이 뜬다)
+                self.ws.settimeout(self.approval_timeout)
+                try:
+                    token = self.request("AuthenticationTokenRequest", self.plugin)["authenticationToken"]
+                finally:
+                    self.ws.settimeout(self.timeout)
+                self.save_token(token)
+                if not self.authenticate(token):
+                    raise RuntimeError("VTube Studio에서 플러그인이 허용되지 않았습니다.")
+        except Exception:
+            self.close()
+            raise
+
+    def authenticate(self, token):
+        return self.request("AuthenticationRequest", dict(self.plugin, authenticationToken=token)).get("authenticated", False)
+
+    def load_token(self):
+        if not os.path.exists(self.token_path):
+            return None
+        with open(self.token_path, "r", encoding="utf-8") as file:
+            return json.load(file).get("token")
+
+    def save_token(self, token):
+        with open(self.token_path, "w", encoding="utf-8") as file:
+            json.dump({"token": token}, file)
+
+    def set_parameter(self, parameter, value):
+        self.request("InjectParameterDataRequest", {
+            "faceFound": False,
+            "mode": "set",
+            "parameterValues": [{"id": parameter, "value": float(value)}],
+        })
+
+    def close(self):
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+
+
+class LipSync(threading.Thread):
+    """
+    재생되는 PCM으로 입 모양을 계산해서 VTube Studio의 MouthOpen 파라미터로 보내는 스레드.
+    AudioPlayer가 조각을 쓰기 직전에 feed()를 부르면 조각 전체의 입 벌림 값을 한 번에 계산하고,
+    재생 위치(지금까지 쓴 샘플 수 / sample_rate + 출력 지연)에 맞춰 fps마다 하나씩 보낸다.
+    오디오를 듣고 움직이는 플러그인과 달리 소리가 나기 전에 값이 준비되어 있어 지연과 떨림이 없다.
+    """
+
+    def __init__(self, sample_rate, url="ws://127.0.0.1:8001", parameter="MouthOpen", fps=30, floor_db=-50.0,
+                 peak_db=-15.0, smoothing=3, plugin_name="Terry AI", developer="TALK_WITH_AI",
+                 token_path="vts_token.json", retry_interval=10, approval_timeout=60):
+        super().__init__(name="lipsync", daemon=True)
+        self.sample_rate = sample_rate
+        self.parameter = parameter
+        self.hop = max(1, sample_rate // fps)
+        self.floor_db = floor_db
+        self.peak_db = peak_db
+        self.smoothing = max(1, smoothing)
+        self.retry_interval = retry_interval
+        self.client = VTubeStudioClient(url, plugin_name, developer, token_path, approval_timeout=approval_timeout)
+        self.next_retry = 0.0
+        self.warned = False
+
+        self.frames = deque()  # (보낼 시각(monotonic), 값)
+        self.condition = threading.Condition()
+        self.begin()
+
+    def begin(self, latency=0.0):
+        """말하기 시작할 때 호출한다. latency는 write()한 소리가 실제로 들리기까지 걸리는 시간."""
+        self.latency = latency
+        self.base = None      # 첫 샘플이 들리는 시각
+        self.written = 0      # 지금까지 feed()된 샘플 수
+        self.pending = np.zeros(0, dtype=np.int16)  # hop에 못 미쳐 다음 조각으로 넘긴 샘플
+        self.history = np.zeros(self.smoothing - 1, dtype=np.float32)
+
+    def feed(self, chunk):
+        """AudioPlayer가 chunk를 출력 장치에 쓰기 직전에 호출한다."""
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        now = time.monotonic()
+        # 처음이거나 재생이 밀려서(언더런) 이 조각이 예정보다 늦게 나오면 지금을 기준으로 다시 맞춘다
+        if self.base is None or now + self.latency > self.base + self.written / self.sample_rate:
+            self.base = now + self.latency - self.written / self.sample_rate
+        position = self.written - len(self.pending)
+        self.written += len(samples)
+
+        samples = np.concatenate((self.pending, samples))
+        values = mouth_envelope(samples, self.hop, self.floor_db, self.peak_db)
+        used = len(values) * self.hop
+        self.pending = samples[used:]
+        self.schedule(values, position)
+
+    def end(self):
+        """말하기가 끝나면 남은 샘플까지 보내고 입을 닫는다."""
+        if self.base is None:
+            return
+        position = self.written - len(self.pending)
+        if len(self.pending):
+            self.schedule(mouth_envelope(self.pending, len(self.pending), self.floor_db, self.peak_db), position)
+        with self.condition:
+            self.frames.append((self.base + self.written / self.sample_rate, 0.0))
+            self.condition.notify()
+        self.begin()
+
+    def schedule(self, values, position):
+        if len(values) == 0:
+            return
+        # 프레임 사이 튀는 값을 이동 평균으로 누른다. 앞 조각의 끝 값을 이어 붙여 경계가 끊기지 않게 한다
+        values = np.concatenate((self.history, values))
+        smoothed = np.convolve(values, np.ones(self.smoothing) / self.smoothing, mode="valid")
+        if self.smoothing > 1:
+            self.history = values[-(self.smoothing - 1):]
+        due = self.base + (position + np.arange(len(smoothed)) * self.hop) / self.sample_rate
+        with self.condition:
+            self.frames.extend(zip(due.tolist(), smoothed.tolist()))
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.frames:
+                    self.condition.wait()
+                delay = self.frames[0][0] - time.monotonic()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                # 늦게 깨어났으면 밀린 프레임은 건너뛰고 가장 최근 값만 보낸다
+                now = time.monotonic()
+                value = self.frames.popleft()[1]
+                while self.frames and self.frames[0][0] <= now:
+                    value = self.frames.popleft()[1]
+                    metrics.inc("terry_lipsync_skipped_total")
+            self.send(value)
+
+    def send(self, value):
+        if self.client.ws is None:
+            if time.monotonic() < self.next_retry:
+                return
+            try:
+                self.client.connect()
+                print("VTube Studio에 연결했습니다.")
+            except Exception as e:
+                self.next_retry = time.monotonic() + self.retry_interval
+                if not self.warned:
+                    # VTube Studio를 켜지 않은 채 방송하는 경우가 많으니 한 번만 알린다
+                    print(f"VTube Studio에 연결할 수 없습니다 ({self.retry_interval}초마다 다시 시도): {e}")
+                    self.warned = True
+                return
+            self.warned = False
+        try:
+            self.client.set_parameter(self.parameter, value)
+        except Exception as e:
+            print(f"VTube Studio 연결이 끊겼습니다: {e}")
+            self.client.close()
+
+
+def start_lipsync(sample_rate, enabled=True, **options):
+    """설정에서 켜져 있으면 LipSync 스레드를 띄워서 돌려준다."""
+    if not enabled:
+        return None
+    lipsync = LipSync(sample_rate, **options)
+    lipsync.start()
+    return lipsync
@@ -0,0 +1,129 @@
+# log_writer.py
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+
+
+class LogWriter:
+    """
+    로그 줄을 큐에 넣기만 하고, 실제 파일 쓰기는 전용 스레드 하나가 모아서 하는 writer.
+    파일 핸들은 최대 max_open개까지 열어둔 채 재사용하고, flush는 flush_interval마다,
+    fsync는 fsync_interval마다 한 번만 한다. 파일이 max_bytes를 넘거나 rotate_interval이 지나면
+    path.1, path.2 ... 로 밀어내고 새 파일에 쓴다.
+    """
+
+    def __init__(self, flush_interval=1.0, fsync_interval=5.0, max_open=8, max_pending=10000,
+                 max_bytes=10 * 1024 * 1024, backup_count=5, rotate_interval=None):
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_interval = rotate_interval
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.files = OrderedDict()  # path -> [file, 크기]
+        self.started = {}           # path -> 지금 파일에 쓰기 시작한 시각 (시간 기준 교체용)
+        self.last_fsync = time.monotonic()
+        self.stop_event = threading.Event()
+
+        self.thread = threading.Thread(target=self.write_loop, name="log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, path, line):
+        """어느 스레드에서든 호출 가능. 큐가 가득 차면 기다리지 않고 버린다."""
+        try:
+            self.queue.put_nowait((path, line))
+        except queue.Full:
+            metrics.inc("terry_log_dropped_total")
+
+    def write_loop(self):
+        while not self.stop_event.is_set() or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                self.sync()
+                continue
+            # flush_interval 동안 쌓인 줄을 한꺼번에 꺼내서 파일마다 write 한 번으로 쓴다
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            grouped = OrderedDict()
+            for path, line in batch:
+                grouped.setdefault(path, []).append(line)
+            for path, lines in grouped.items():
+                try:
+                    self.append(path, "".join(lines))
+                except Exception as e:
+                    print(f"로그 쓰기 실패 ({path}): {e}")
+            self.sync()
+            self.stop_event.wait(self.flush_interval)
+
+    def append(self, path, text):
+        entry = self.open(path)
+        data = text.encode("utf-8")
+        if self.should_rotate(path, entry, len(data)):
+            self.rotate(path)
+            entry = self.open(path)
+        entry[0].write(data)
+        entry[1] += len(data)
+
+    def open(self, path):
+        entry = self.files.get(path)
+        if entry is not None:
+            self.files.move_to_end(path)
+            return entry
+        if len(self.files) >= self.max_open:
+            _, (file, _) = self.files.popitem(last=False)
+            file.close()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file = open(path, "ab")
+        entry = self.files[path] = [file, file.tell()]
+        self.started.setdefault(path, time.time())
+        return entry
+
+    def should_rotate(self, path, entry, incoming):
+        if self.max_bytes and entry[1] > 0 and entry[1] + incoming > self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and time.time() - self.started[path] > self.rotate_interval
+
+    def rotate(self, path):
+        file, _ = self.files.pop(path)
+        file.close()
+        self.started.pop(path, None)
+        if self.backup_count <= 0:
+            os.remove(path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{path}.{index}"):
+                os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+        os.replace(path, f"{path}.1")
+
+    def sync(self, force=False):
+        for file, _ in self.files.values():
+            file.flush()
+        if force or time.monotonic() - self.last_fsync >= self.fsync_interval:
+            for file, _ in self.files.values():
+                os.fsync(file.fileno())
+            self.last_fsync = time.monotonic()
+
+    def close(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+        self.sync(force=True)
+        for file, _ in self.files.values():
+            file.close()
+        self.files.clear()
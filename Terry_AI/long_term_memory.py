@@ -0,0 +1,171 @@
+# long_term_memory.py
+
+import atexit
+import datetime
+import json
+import os
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from chat_filter import normalize
+
+
+def embed(text, dim=512, sizes=(2, 3)):
+    """
+    글자 n-gram을 crc32로 dim칸에 흩어 넣은 벡터 (L2 정규화).
+    모델 없이 바로 계산되고, 재시작해도 같은 문장은 같은 벡터가 된다.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    compact = normalize(text).replace(' ', '')
+    for size in sizes:
+        for i in range(len(compact) - size + 1):
+            code = zlib.crc32(compact[i:i + size].encode("utf-8"))
+            # 최상위 비트로 부호를 정해서 충돌한 n-gram끼리 서로 상쇄되게 한다
+            vector[code % dim] += 1.0 if code & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class LongTermMemory:
+    """
+    지난 대화(시청자 질문 + Terry 대답)를 기억하는 저장소.
+    벡터는 (capacity, dim) float32 memmap 한 장에 들어 있어서 검색은 행렬-벡터 곱 한 번으로 끝나고,
+    가득 차면 중요도 × 최근성 점수가 가장 낮은 칸을 덮어쓴다.
+    불려 나온 기억은 중요도가 조금씩 올라가서 자주 쓰이는 기억이 오래 남는다.
+    """
+
+    def __init__(self, path="user_data/long_term_memory", capacity=5000, dim=512, top_k=3, min_score=0.3,
+                 half_life_days=7.0, save_every=20):
+        # atexit에서 저장할 때 작업 폴더가 바뀌어 있어도 같은 파일에 쓰도록 절대 경로로 잡아둔다
+        path = os.path.abspath(path)
+        os.makedirs(path, exist_ok=True)
+        self.vectors_path = os.path.join(path, "vectors.npy")
+        self.entries_path = os.path.join(path, "entries.json")
+        self.capacity = capacity
+        self.dim = dim
+        self.top_k = top_k
+        self.min_score = min_score
+        self.half_life = half_life_days * 24 * 60 * 60
+        self.save_every = save_every
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.closed = False
+
+        self.entries = [None] * capacity  # 칸마다 {"text", "author", "created_at"} 또는 None
+        self.used = np.zeros(capacity, dtype=bool)
+        self.importance = np.zeros(capacity, dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.vectors = self.open_vectors()
+        self.load_entries()
+        atexit.register(self.close)
+
+    def open_vectors(self):
+        if os.path.exists(self.vectors_path):
+            vectors = np.load(self.vectors_path, mmap_mode="r+")
+            if vectors.shape == (self.capacity, self.dim):
+                return vectors
+            print(f"기억 저장소 크기가 설정과 달라 새로 만듭니다: {vectors.shape}")
+            del vectors
+            if os.path.exists(self.entries_path):
+                os.remove(self.entries_path)
+        return np.lib.format.open_memmap(self.vectors_path, mode="w+", dtype=np.float32,
+                                         shape=(self.capacity, self.dim))
+
+    def load_entries(self):
+        if not os.path.exists(self.entries_path):
+            return
+        with open(self.entries_path, "r", encoding="utf-8") as file:
+            saved = json.load(file)
+        for slot, entry in enumerate(saved[:self.capacity]):
+            if entry is None:
+                continue
+            self.entries[slot] = {"text": entry["text"], "author": entry["author"],
+                                  "created_at": entry["created_at"]}
+            self.used[slot] = True
+            self.importance[slot] = entry["importance"]
+            self.last_used[slot] = entry["last_used"]
+
+    def add(self, author, message, response, importance=1.0):
+        vector = embed(f"{message} {response}", self.dim)
+        if not vector.any():
+            return
+        now = time.time()
+        with self.lock:
+            slot = self.free_slot(now)
+            self.vectors[slot] = vector
+            self.entries[slot] = {"text": f"{author}: {message} / Terry: {response}", "author": author,
+                                  "created_at": str(datetime.datetime.now())[:16]}
+            self.used[slot] = True
+            self.importance[slot] = importance
+            self.last_used[slot] = now
+            self.unsaved += 1
+            should_save = self.unsaved >= self.save_every
+        if should_save:
+            # 응답 생성 스레드가 디스크 쓰기를 기다리지 않도록 따로 저장한다
+            threading.Thread(target=self.save, daemon=True).start()
+
+    def free_slot(self, now):
+        # lock을 잡은 상태에서 호출한다
+        empty = np.flatnonzero(~self.used)
+        if empty.size:
+            return int(empty[0])
+        return int(np.argmin(self.retention(now)))
+
+    def retention(self, now):
+        """중요도 × 반감기 감쇠. 낮을수록 먼저 지워진다."""
+        age = np.maximum(now - self.last_used, 0.0)
+        return self.importance * np.exp2(-age / self.half_life)
+
+    def search(self, query, top_k=None):
+        """query와 코사인 유사도가 높은 기억을 최대 top_k개 돌려준다 (가장 비슷한 것부터)."""
+        top_k = top_k or self.top_k
+        vector = embed(query, self.dim)
+        if not vector.any():
+            return []
+        now = time.time()
+        with self.lock:
+            if not self.used.any():
+                return []
+            scores = self.vectors @ vector  # 정규화된 벡터끼리라 내적이 곧 코사인 유사도
+            scores[~self.used] = -1.0
+            count = min(top_k, int(self.used.sum()))
+            best = np.argpartition(-scores, count - 1)[:count]
+            best = best[np.argsort(-scores[best])]
+            best = best[scores[best] >= self.min_score]
+
+            self.last_used[best] = now
+            self.importance[best] = np.minimum(self.importance[best] + 0.1, 5.0)
+            return [self.entries[slot]["text"] for slot in best]
+
+    def save(self):
+        with self.save_lock:
+            if not self.closed:
+                self.write_entries()
+
+    def close(self):
+        """마지막으로 저장하고 닫는다. 여러 번 불러도 되고, 닫은 뒤의 save()는 아무것도 하지 않는다."""
+        with self.save_lock:
+            if self.closed:
+                return
+            self.write_entries()
+            self.closed = True
+
+    def write_entries(self):
+        with self.lock:
+            self.vectors.flush()
+            saved = [
+                None if entry is None else dict(entry, importance=float(self.importance[slot]),
+                                                 last_used=float(self.last_used[slot]))
+                for slot, entry in enumerate(self.entries)
+            ]
+            self.unsaved = 0
+        temp_path = f"{self.entries_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(saved, file, ensure_ascii=False)
+        os.replace(temp_path, self.entries_path)
@@ -0,0 +1,235 @@
+# metrics.py
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 초 단위 히스토그램 구간. 웹소켓 처리(ms)부터 LLM 생성(수 초)까지 한 번에 본다
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    text = ",".join(f'{key}="{escape(value)}"' for key, value in pairs)
+    return "{" + text + "}"
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """구간 경계로 어림한 백분위수. 마지막 구간에 들어가면 가장 큰 경계를 돌려준다."""
+        if self.count == 0:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return BUCKETS[-1]
+
+
+class Metrics:
+    """
+    프로세스 안의 카운터, 히스토그램, 게이지를 모아두는 곳.
+    값을 올리는 쪽은 락 한 번과 dict 조회만 하므로 방송 중에도 켜둘 수 있고,
+    게이지(큐 길이 등)는 읽을 때 콜백을 불러서 계산한다.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}    # (이름, 라벨) -> 값
+        self.histograms = {}  # (이름, 라벨) -> Histogram
+        self.gauges = {}      # 이름 -> (콜백, 라벨 이름)
+        self.started = time.time()
+
+    def reset(self):
+        """카운터와 히스토그램을 비운다. 부하 테스트에서 단계마다 따로 재려고 쓴다."""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, stage):
+        """with 블록에 걸린 시간을 terry_stage_seconds{stage=...}에 기록한다."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("terry_stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def gauge(self, name, callback, label=None):
+        """callback이 숫자를 돌려주면 그대로, dict를 돌려주면 키를 label 값으로 해서 내보낸다."""
+        self.gauges[name] = (callback, label)
+
+    def read_gauges(self):
+        values = []
+        for name, (callback, label) in list(self.gauges.items()):
+            try:
+                value = callback()
+            except Exception as e:
+                print(f"게이지 {name} 읽기 실패: {e}")
+                continue
+            if isinstance(value, dict):
+                values.extend((name, ((label, key),), number) for key, number in value.items())
+            else:
+                values.append((name, (), value))
+        return values
+
+    def render_prometheus(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(h.counts), h.total, h.count) for key, h in self.histograms.items())
+
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{format_labels(labels)} {value}")
+
+        for (name, labels), counts, total, count in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+
+        for name, labels, value in self.read_gauges():
+            declare(name, "gauge")
+            lines.append(f"{name}{format_labels(labels)} {value}")
+
+        declare("terry_uptime_seconds", "gauge")
+        lines.append(f"terry_uptime_seconds {time.time() - self.started:.1f}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self.lock:
+            counters = {f"{name}{format_labels(labels)}": value for (name, labels), value in self.counters.items()}
+            histograms = {
+                f"{name}{format_labels(labels)}": {
+                    "count": h.count,
+                    "mean": h.total / h.count if h.count else None,
+                    "p50": h.quantile(0.5),
+                    "p90": h.quantile(0.9),
+                    "p99": h.quantile(0.99),
+                }
+                for (name, labels), h in self.histograms.items()
+            }
+        gauges = {f"{name}{format_labels(labels)}": value for name, labels, value in self.read_gauges()}
+        return {
+            "time": time.time(),
+            "uptime": time.time() - self.started,
+            "counters": counters,
+            "histograms": histograms,
+            "gauges": gauges,
+        }
+
+
+metrics = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = metrics.render_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class SnapshotWriter(threading.Thread):
+    """interval초마다 지표 스냅샷을 JSON 파일로 덮어쓴다. 쓰는 중에 읽어도 깨지지 않게 임시 파일을 바꿔치기한다."""
+
+    def __init__(self, path, interval=30):
+        super().__init__(name="metrics-snapshot", daemon=True)
+        self.path = path
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    json.dump(metrics.snapshot(), file, indent=2, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                print(f"지표 스냅샷 저장 실패: {e}")
+
+
+def start_metrics(enabled=True, host="127.0.0.1", port=9108, snapshot_path="metrics.json", snapshot_interval=30):
+    """
+    /metrics (Prometheus 텍스트)와 /metrics.json을 내보내는 로컬 HTTP 서버와 스냅샷 스레드를 띄운다.
+    port가 이미 쓰이고 있으면 서버 없이 스냅샷만 남긴다.
+    """
+    if not enabled:
+        return None
+
+    server = None
+    if port:
+        try:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"지표: http://{host}:{port}/metrics")
+        except OSError as e:
+            print(f"지표 서버를 열 수 없습니다 ({host}:{port}): {e}")
+
+    if snapshot_path:
+        SnapshotWriter(snapshot_path, snapshot_interval).start()
+    return server
@@ -0,0 +1,199 @@
+# multi_channel.py
+
+import argparse
+import asyncio
+import json
+import time
+
+import pytchat
+import websockets
+
+import api
+from api import fetch_chatChannelId, fetch_channelName, fetch_accessToken
+from cookies_manager import ensure_login, load_cookies, CredentialRefresher
+from cmd_type import CHZZK_CHAT_CMD
+from language import detect_language
+from reconnect import Backoff, SeenMessages
+from chzzk_decoder import ChzzkDecoder
+from terry_module import load_terry
+from metrics import metrics
+
+
+class ChatDispatcher:
+    """모든 채널의 채팅을 받아서 하나의 ChatBot(LLM/TTS는 하나만 띄움)으로 넘긴다."""
+
+    def __init__(self, chatbot, logger):
+        self.chatbot = chatbot
+        self.logger = logger
+
+    def dispatch(self, channel, author, message, language, platform, chat_type='채팅'):
+        self.logger.info(f'[{channel["name"]}][{platform}][{chat_type}] {author} : {message}')
+        if channel.get("mute"):
+            return
+        # handle_message는 필터 검사 후 대기열에 넣기만 하므로 이벤트 루프를 막지 않는다
+        self.chatbot.handle_message(author, message, language, platform, channel=channel["name"], chat_type=chat_type)
+
+
+async def poll_chat_channel(streamer, credentials, status, interval=30):
+    """
+    chatChannelId가 바뀌었는지 interval마다 확인해서 status에 넣는 태스크 (ChannelStatusPoller의 asyncio판).
+    웹소켓 읽기 루프는 HTTP를 기다리지 않고 ping 때 status 값만 비교한다.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            status["chatChannelId"] = await asyncio.to_thread(fetch_chatChannelId, streamer, credentials.cookies)
+        except Exception:
+            pass  # 실패하면 이전 값을 그대로 둔다 (오류 내용은 fetch 함수에서 출력)
+
+
+async def run_chzzk(channel, credentials, userIdHash, dispatcher, token_ttl=60 * 60, status_interval=30):
+    """
+    치지직 채널 하나의 웹소켓을 유지하는 태스크.
+    끊기면 backoff 후 다시 연결하고, 최근 채팅 응답으로 끊긴 동안의 채팅을 (uid, msgTime) 기준 한 번씩만 채운다.
+    쿠키는 연결할 때마다 credentials.cookies에서 읽으므로 refresher가 바꾼 값이 다음 연결부터 쓰인다.
+    방송을 다시 켜서 chatChannelId가 바뀌면 연결된 채로 조용해지므로, ping 때 확인해서 새 채널로 다시 연결한다.
+    """
+    streamer = channel["chzzk"]
+    language = channel.get("language", "ko")
+    channelName = await asyncio.to_thread(fetch_channelName, streamer)
+    backoff = Backoff()
+    seen = SeenMessages()
+    decoder = ChzzkDecoder()
+    fill_gap = False
+    chatChannelId = accessToken = None
+    token_time = 0
+    status = {"chatChannelId": None}
+    poller = asyncio.create_task(poll_chat_channel(streamer, credentials, status, status_interval))
+
+    while True:
+        try:
+            cookies = credentials.cookies
+            latestChannelId = await asyncio.to_thread(fetch_chatChannelId, streamer, cookies)
+            if latestChannelId != chatChannelId or time.time() - token_time > token_ttl:
+                chatChannelId = latestChannelId
+                accessToken, _ = await asyncio.to_thread(fetch_accessToken, chatChannelId, cookies)
+                token_time = time.time()
+
+            async with websockets.connect(api.CHZZK_CHAT_URL) as sock:
+                default_dict = {
+                    "ver": "2",
+                    "svcid": "game",
+                    "cid": chatChannelId,
+                }
+                send_dict = {
+                    "cmd": CHZZK_CHAT_CMD['connect'],
+                    "tid": 1,
+                    "bdy": {
+                        "uid": userIdHash,
+                        "devType": 2001,
+                        "accTkn": accessToken,
+                        "auth": "SEND"
+                    }
+                }
+                await sock.send(json.dumps(dict(send_dict, **default_dict)))
+                sid = json.loads(await sock.recv())['bdy']['sid']
+
+                send_dict = {
+                    "cmd": CHZZK_CHAT_CMD['request_recent_chat'],
+                    "tid": 2,
+                    "sid": sid,
+                    "bdy": {
+                        "recentMessageCount": 50
+                    }
+                }
+                await sock.send(json.dumps(dict(send_dict, **default_dict)))
+                print(f'{channelName} 채팅창 연결 완료')
+                backoff.reset()
+
+                async for raw_message in sock:
+                    chat_cmd, records = decoder.decode(raw_message)
+
+                    if chat_cmd == CHZZK_CHAT_CMD['ping']:
+                        await sock.send(json.dumps({"ver": "2", "cmd": CHZZK_CHAT_CMD['pong']}))
+                        if status["chatChannelId"] and status["chatChannelId"] != chatChannelId:
+                            # 소켓을 닫고 나가면 위에서 새 chatChannelId와 토큰으로 다시 연결한다
+                            print(f"[{channel['name']}] 채팅 채널이 바뀌어 다시 연결합니다.")
+                            break
+                        continue
+
+                    if chat_cmd == CHZZK_CHAT_CMD['recent_chat'] and not fill_gap:
+                        for record in records:
+                            seen.add(record.key)
+                        fill_gap = True
+                        continue
+
+                    for record in records:
+                        if not seen.add(record.key):
+                            metrics.inc("terry_chat_dropped_total", reason="seen")
+                        else:
+                            dispatcher.dispatch(channel, record.nickname, record.message, language, "Chzzk", record.chat_type)
+        except asyncio.CancelledError:
+            poller.cancel()
+            raise
+        except Exception as e:
+            delay = backoff.next_delay()
+            metrics.inc("terry_reconnects_total", platform="Chzzk")
+            print(f"[{channel['name']}] 치지직 연결 오류: {e}, {delay:.1f}초 후 재연결")
+            token_time = 0
+            credentials.last_check = 0
+            await asyncio.sleep(delay)
+
+
+async def run_youtube(channel, dispatcher, poll_interval=1.0):
+    """유튜브 라이브 채팅 하나를 폴링하는 태스크. pytchat의 HTTP 호출만 스레드에서 돈다."""
+    video_id = channel["youtube"]
+    try:
+        chat = await asyncio.to_thread(pytchat.create, video_id=video_id, interruptable=False)
+    except pytchat.exceptions.InvalidVideoIdException:
+        print(f"Invalid video id: {video_id}")
+        return
+
+    while chat.is_alive():
+        try:
+            chat_data = await asyncio.to_thread(chat.get)
+            for c in chat_data.items:
+                dispatcher.dispatch(channel, c.author.name, c.message, detect_language(c.message), "YouTube")
+        except Exception as e:
+            print(f"[{channel['name']}] Error fetching YouTube chat: {e}")
+        await asyncio.sleep(poll_interval)
+
+
+async def run_engine(channels, cookies, dispatcher, credential_config=None):
+    userIdHash = None
+    credentials = None
+    if any(channel.get("chzzk") for channel in channels):
+        # 저장된 쿠키가 유효하면 바로 쓰고, 만료됐을 때만 브라우저 로그인을 띄운다
+        cookies, userIdHash = await asyncio.to_thread(ensure_login, cookies)
+        credentials = CredentialRefresher(cookies, **(credential_config or {}))
+        credentials.start()
+
+    tasks = []
+    for channel in channels:
+        if channel.get("chzzk"):
+            tasks.append(asyncio.create_task(run_chzzk(channel, credentials, userIdHash, dispatcher)))
+        if channel.get("youtube"):
+            tasks.append(asyncio.create_task(run_youtube(channel, dispatcher)))
+    print(f"채널 {len(channels)}개, 수집 태스크 {len(tasks)}개 시작")
+    await asyncio.gather(*tasks)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--channels', type=str, default='channels.json')
+    args = parser.parse_args()
+
+    with open(args.channels, 'r', encoding='utf-8') as f:
+        channels = json.load(f)["channels"]
+    cookies = load_cookies()
+
+    terry = load_terry()
+    chatbot = terry.ChatBot()
+    for channel in channels:
+        chatbot.register_channel(channel["name"], channel.get("system_message"))
+
+    try:
+        asyncio.run(run_engine(channels, cookies, ChatDispatcher(chatbot, terry.get_logger()),
+                               chatbot.config.get("credentials")))
+    except KeyboardInterrupt:
+        print("프로그램이 종료되었습니다.")
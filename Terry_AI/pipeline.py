@@ -0,0 +1,152 @@
+# pipeline.py
+
+import queue
+import threading
+import time
+
+
+class PipelineStage(threading.Thread):
+    """입력 큐에서 작업을 하나씩 꺼내 처리하고, 결과를 다음 큐로 넘기는 워커 스레드."""
+
+    def __init__(self, name, handler, in_queue, out_queue=None):
+        super().__init__(name=name, daemon=True)
+        self.handler = handler
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.running = True
+
+    def run(self):
+        while self.running:
+            try:
+                item = self.in_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                self.emit(self.handler(item))
+            except Exception as e:
+                print(f"[{self.name}] 처리 중 오류: {e}")
+            finally:
+                self.in_queue.task_done()
+
+    def emit(self, results):
+        # handler는 다음 단계로 넘길 결과를 0개 이상 돌려준다 (generator 가능)
+        for result in results or ():
+            if self.out_queue is not None:
+                # 다음 단계 큐가 가득 차 있으면 기다린다 (backpressure)
+                self.out_queue.put(result)
+
+    def stop(self):
+        self.running = False
+
+
+class BatchingStage(PipelineStage):
+    """
+    첫 메시지를 꺼낸 뒤 잠깐 기다리며 최대 max_batch개까지 모아서 handler에 리스트로 넘기는 단계.
+    대기열이 비어 있으면 min_window만 기다려 지연을 늘리지 않고,
+    대기열이 쌓일수록 max_window까지 늘려서 한 번의 LLM 호출로 더 많은 채팅을 처리한다.
+    """
+
+    def __init__(self, name, handler, in_queue, out_queue, max_batch=5, min_window=0.3, max_window=3.0):
+        super().__init__(name, handler, in_queue, out_queue)
+        self.max_batch = max_batch
+        self.min_window = min_window
+        self.max_window = max_window
+
+    def window(self):
+        fill = min(1.0, self.in_queue.qsize() / self.max_batch)
+        return self.min_window + (self.max_window - self.min_window) * fill
+
+    def run(self):
+        while self.running:
+            try:
+                batch = [self.in_queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.window()
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.in_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self.emit(self.handler(batch))
+            except Exception as e:
+                print(f"[{self.name}] 처리 중 오류: {e}")
+            finally:
+                for _ in batch:
+                    self.in_queue.task_done()
+
+
+class ResponsePipeline:
+    """
+    채팅 수집과 응답 생성을 분리하는 단계별 파이프라인.
+    수집 스레드는 submit()으로 큐에 넣기만 하고, LLM → 번역 → TTS → 재생이
+    각자의 스레드에서 돌기 때문에 N번째 메시지를 재생하는 동안 N+1번째 LLM 호출이 진행된다.
+    """
+
+    def __init__(self, chatbot, ingest_queue_size=100, stage_queue_size=4, playback_queue_size=1,
+                 max_batch=1, min_window=0.3, max_window=3.0, ingest_queue=None):
+        # ingest_queue를 주면 (예: scheduler.ChatScheduler) 그 대기열에서 꺼내는 순서대로 LLM을 부른다
+        self.ingest_queue = ingest_queue if ingest_queue is not None else queue.Queue(maxsize=ingest_queue_size)
+        self.translate_queue = queue.Queue(maxsize=stage_queue_size)
+        self.tts_queue = queue.Queue(maxsize=stage_queue_size)
+        # 재생 대기열이 작을수록 TTS 단계가 딱 한 발짝만 앞서서 합성한다
+        self.playback_queue = queue.Queue(maxsize=playback_queue_size)
+        self.dropped = 0
+
+        if max_batch > 1:
+            llm_stage = BatchingStage("llm", chatbot.process_batch, self.ingest_queue, self.translate_queue,
+                                      max_batch, min_window, max_window)
+        else:
+            llm_stage = PipelineStage("llm", chatbot.process_message, self.ingest_queue, self.translate_queue)
+
+        self.stages = [
+            llm_stage,
+            PipelineStage("translate", chatbot.finalize_response, self.translate_queue, self.tts_queue),
+            PipelineStage("tts", chatbot.synthesize, self.tts_queue, self.playback_queue),
+            PipelineStage("playback", chatbot.playback, self.playback_queue),
+        ]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+
+    def submit(self, item):
+        """수집 스레드에서 호출. 큐가 가득 차면 기다리지 않고 버린다 (스케줄러는 더 낮은 등급을 대신 밀어낸다)."""
+        try:
+            self.ingest_queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"대기열이 가득 차서 메시지를 버립니다: {item.get('message')}")
+            return False
+
+    def speak(self, text, language="ko"):
+        """LLM을 거치지 않고 바로 TTS 단계로 보낼 문장 (혼잣말 등)."""
+        self.tts_queue.put({"text": text, "language": language})
+
+    def play(self, item):
+        """이미 합성해둔 음성(item["audio"])을 바로 재생 단계로 보낸다."""
+        self.playback_queue.put(item)
+
+    def queue_depths(self):
+        return {
+            "ingest": self.ingest_queue.qsize(),
+            "translate": self.translate_queue.qsize(),
+            "tts": self.tts_queue.qsize(),
+            "playback": self.playback_queue.qsize(),
+        }
+
+    def is_idle(self):
+        queues = (self.ingest_queue, self.translate_queue, self.tts_queue, self.playback_queue)
+        return all(q.unfinished_tasks == 0 for q in queues)
@@ -0,0 +1,136 @@
+# prompt_builder.py
+
+
+def estimate_tokens(text):
+    """대략적인 토큰 수. 한글/한자 등은 글자당 1토큰, 영어/숫자는 4글자당 1토큰으로 본다."""
+    ascii_count = sum(1 for ch in text if ch.isascii())
+    return (len(text) - ascii_count) + (ascii_count + 3) // 4
+
+
+def truncate(text, budget):
+    """토큰 예산 안에 들어오도록 뒤를 자른다."""
+    if estimate_tokens(text) <= budget:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + "..."
+
+
+class PromptBuilder:
+    """
+    섹션별 토큰 예산을 지키면서 ollama에 보낼 messages를 만드는 클래스.
+    system 메시지는 매번 바이트 단위로 똑같이 맨 앞에 두어 ollama가 KV 캐시를 재사용할 수 있게 하고,
+    매번 바뀌는 시청자 정보는 현재 메시지 바로 앞에 둔다.
+    """
+
+    def __init__(self, system_message, history_tokens=1200, user_data_tokens=300, message_tokens=300,
+                 memory_tokens=200):
+        self.system = {"role": "system", "content": system_message}
+        self.history_tokens = history_tokens
+        self.user_data_tokens = user_data_tokens
+        self.message_tokens = message_tokens
+        self.memory_tokens = memory_tokens
+
+    def fit_history(self, history, current):
+        """
+        현재 메시지(들)는 마지막에 따로 넣으므로 history에서 빼고,
+        최근 대화부터 거꾸로 채워서 예산을 넘기기 전까지만 남긴다.
+        """
+        kept = []
+        used = 0
+        for entry in reversed(history):
+            if entry["content"] in current:
+                continue
+            cost = estimate_tokens(entry["content"])
+            if used + cost > self.history_tokens:
+                break
+            kept.append(entry)
+            used += cost
+        kept.reverse()
+        return kept
+
+    def fit_user_data(self, user_data, current=None):
+        """
+        요약 줄은 남기고, 최근 메시지는 새것부터 예산만큼만 남긴다.
+        맨 끝 줄이 지금 대답할 메시지(current)이면 마지막에 따로 넣으므로 뺀다.
+        """
+        if not user_data:
+            return ""
+        summary, *lines = user_data.split("\n")
+        if current is not None and lines and lines[-1].endswith(f": {current}"):
+            lines.pop()
+        budget = self.user_data_tokens - estimate_tokens(summary)
+        kept = []
+        for line in reversed(lines):
+            budget -= estimate_tokens(line)
+            if budget < 0:
+                break
+            kept.append(line)
+        kept.reverse()
+        return "\n".join([truncate(summary, self.user_data_tokens)] + kept)
+
+    def fit_memories(self, memories):
+        """관련도 순으로 들어온 기억을 예산 안에서 앞에서부터 채운다."""
+        kept = []
+        budget = self.memory_tokens
+        for memory in memories or ():
+            cost = estimate_tokens(memory)
+            if cost > budget:
+                break
+            kept.append(f"- {memory}")
+            budget -= cost
+        return "\n".join(kept)
+
+    def add_context(self, messages, user_data="", memories=None, current=None):
+        """매번 바뀌는 부분(기억, 시청자 정보)은 history 뒤, 현재 메시지 바로 앞에 둔다."""
+        memories = self.fit_memories(memories)
+        if memories:
+            messages.append({"role": "user", "content": f"Things you remember from earlier streams:\n{memories}"})
+        user_data = self.fit_user_data(user_data, current)
+        if user_data:
+            messages.append({"role": "user", "content": f"User data:\n{user_data}"})
+
+    def system_for(self, system_message):
+        # 채널별 페르소나가 있으면 그 채널 안에서 고정된 접두사가 된다
+        if system_message is None:
+            return self.system
+        return {"role": "system", "content": system_message}
+
+    def build(self, history, author, message, user_data="", system_message=None, memories=None):
+        messages = [self.system_for(system_message)]
+        messages.extend(self.fit_history(history, {f"{author}: {message}"}))
+        self.add_context(messages, user_data, memories, current=message)
+        messages.append({"role": "user", "content": f"{author}: {truncate(message, self.message_tokens)}"})
+        return messages
+
+    def build_batch(self, history, items, system_message=None, memories=None):
+        """묶음 모드. 이번 묶음의 채팅들은 한 메시지로 모아서 마지막에 넣는다."""
+        messages = [self.system_for(system_message)]
+        messages.extend(self.fit_history(history, {f"{item['author']}: {item['message']}" for item in items}))
+        self.add_context(messages, memories=memories)
+        chat_lines = "\n".join(
+            f"- {item['author']}: {truncate(item['message'], self.message_tokens)}" for item in items
+        )
+        messages.append({
+            "role": "user",
+            "content": "Several viewers chatted at the same time. Reply to them together in one answer, "
+                       f"calling each viewer by name:\n{chat_lines}"
+        })
+        return messages
+
+    def build_mutter(self, history, system_message=None, recent_lines=()):
+        """채팅이 조용할 때 할 혼잣말. 최근 대화 흐름은 보되 특정 시청자에게 대답하지는 않게 한다."""
+        messages = [self.system_for(system_message)]
+        messages.extend(self.fit_history(history, set()))
+        avoid = "\n".join(f"- {line}" for line in recent_lines)
+        content = ("Chat has been quiet for a while. Say one or two short sentences to yourself, like a streamer "
+                   "thinking out loud about the game or the stream. Do not address any viewer by name.")
+        if avoid:
+            content += f" Do not repeat these lines:\n{avoid}"
+        messages.append({"role": "user", "content": content})
+        return messages
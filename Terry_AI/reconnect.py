@@ -0,0 +1,41 @@
+# reconnect.py
+
+import random
+from collections import deque
+
+
+class Backoff:
+    """재연결 대기 시간. 실패할 때마다 두 배로 늘리고, 여러 클라이언트가 동시에 몰리지 않도록 jitter를 섞는다."""
+
+    def __init__(self, base=0.5, maximum=30.0):
+        self.base = base
+        self.maximum = maximum
+        self.attempt = 0
+
+    def next_delay(self):
+        delay = min(self.maximum, self.base * (2 ** self.attempt))
+        self.attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class SeenMessages:
+    """최근에 처리한 메시지 키를 기억하는 고정 크기 링 버퍼. 같은 메시지를 두 번 처리하지 않게 한다."""
+
+    def __init__(self, size=2000):
+        self.order = deque()
+        self.keys = set()
+        self.size = size
+
+    def add(self, key):
+        """처음 보는 키면 True, 이미 처리한 키면 False."""
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        self.order.append(key)
+        if len(self.order) > self.size:
+            self.keys.discard(self.order.popleft())
+        return True
+
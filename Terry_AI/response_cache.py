@@ -0,0 +1,77 @@
+# response_cache.py
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from chat_filter import normalize
+
+PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+class ResponseCache:
+    """
+    자주 나오는 질문("몇 살이에요?", "MBTI 뭐예요?")에 대한 최종 대답(번역까지 끝난 문장 목록)을 기억하는 캐시.
+    정규화(기호, 띄어쓰기 제거)한 질문이 글자 그대로 같을 때만 같은 질문으로 본다.
+    "오늘"/"내일", "#12"/"#13"처럼 한두 글자만 달라도 다른 질문이라 비슷한 정도로는 맞추지 않는다.
+    질문마다 대답을 최대 variants개까지 모아두고, 방금 한 말(exclude)과 겹치지 않는 것을 골라준다.
+    짧은 질문(max_length 이하)만 캐시하고, ttl이 지나거나 LRU로 밀려나면 지운다.
+    """
+
+    def __init__(self, enabled=True, max_entries=500, ttl=1800, max_length=40, variants=3):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_length = max_length
+        self.variants = variants
+        self.entries = OrderedDict()  # (channel, 질문) -> {"responses": [문장 목록, ...], "created"}
+        self.lock = threading.Lock()
+
+    def make_key(self, message):
+        if not self.enabled:
+            return None
+        key = PUNCTUATION.sub('', normalize(message)).replace(' ', '')
+        if not key or len(key) > self.max_length:
+            return None
+        return key
+
+    def get(self, message, channel=None, exclude=()):
+        """캐시된 대답(문장 목록)을 돌려준다. exclude에 든 문장이 하나라도 있는 대답은 건너뛴다."""
+        key = self.make_key(message)
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.find((channel, key))
+            if entry is None:
+                return None
+            for sentences in entry["responses"]:
+                if not any(sentence in exclude for sentence in sentences):
+                    return list(sentences)
+        return None
+
+    def put(self, message, channel, sentences):
+        key = self.make_key(message)
+        if key is None or not sentences:
+            return
+        sentences = tuple(sentences)
+        with self.lock:
+            entry = self.find((channel, key))
+            if entry is None:
+                entry = self.entries[(channel, key)] = {"responses": [], "created": time.time()}
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            if sentences not in entry["responses"]:
+                entry["responses"].append(sentences)
+                del entry["responses"][:-self.variants]
+
+    def find(self, entry_key):
+        """lock을 잡은 상태에서 호출한다. ttl이 지난 항목은 지우고 None."""
+        entry = self.entries.get(entry_key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl:
+            del self.entries[entry_key]
+            return None
+        self.entries.move_to_end(entry_key)
+        return entry
@@ -0,0 +1,124 @@
+# scheduler.py
+
+import queue
+import threading
+import time
+from collections import deque
+
+from metrics import metrics
+
+# 등급 이름 -> (순위, 대답할 수 있는 최대 대기 시간(초)). 순위가 낮을수록 먼저 꺼낸다.
+DEFAULT_CLASSES = {
+    "donation": {"rank": 0, "deadline": 300},
+    "mention": {"rank": 1, "deadline": 60},
+    "new_viewer": {"rank": 2, "deadline": 45},
+    "chat": {"rank": 3, "deadline": 20},
+}
+
+
+class ChatScheduler:
+    """
+    LLM 단계 앞에 두는 우선순위 대기열. queue.Queue와 같은 메서드를 제공해서 파이프라인 단계가 그대로 쓴다.
+    등급마다 FIFO를 두고 순위가 높은 등급부터 꺼내며, received_at부터 deadline이 지난 채팅은 꺼낼 때 버린다.
+    capacity를 넘으면 가장 낮은 등급의 가장 오래된 채팅부터 밀어내서, 후원이나 Terry를 부르는 채팅은
+    일반 채팅이 아무리 많아도 대기 시간이 deadline 안에서 끝난다.
+    """
+
+    def __init__(self, capacity=100, classes=None, default_class="chat"):
+        self.capacity = capacity
+        self.classes = dict(DEFAULT_CLASSES, **(classes or {}))
+        self.default_class = default_class
+        # 순위 순서대로 정렬한 (등급 이름, FIFO)
+        self.lanes = [(name, deque()) for name in sorted(self.classes, key=lambda name: self.classes[name]["rank"])]
+        self.lane_by_name = dict(self.lanes)
+        self.size = 0
+        self.unfinished_tasks = 0
+        self.mutex = threading.Lock()
+        self.not_empty = threading.Condition(self.mutex)
+
+    def class_of(self, item):
+        name = item.get("priority", self.default_class)
+        return name if name in self.classes else self.default_class
+
+    def put(self, item, block=True, timeout=None):
+        # 가득 차도 기다리지 않고 밀어내기 때문에 block/timeout은 쓰지 않는다
+        self.put_nowait(item)
+
+    def put_nowait(self, item):
+        name = self.class_of(item)
+        with self.mutex:
+            if self.size >= self.capacity:
+                self.drop_stale(time.time())
+            if self.size >= self.capacity and not self.shed(self.classes[name]["rank"]):
+                # 들어온 채팅이 대기열에서 가장 낮은 등급이면 이 채팅을 버린다
+                raise queue.Full
+            self.lane_by_name[name].append(item)
+            self.size += 1
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def shed(self, rank):
+        """mutex를 잡은 상태에서 호출한다. rank보다 낮은 등급의 가장 오래된 채팅 하나를 버린다."""
+        for name, lane in reversed(self.lanes):
+            if self.classes[name]["rank"] <= rank:
+                return False
+            if lane:
+                lane.popleft()
+                self.discard("shed")
+                return True
+        return False
+
+    def drop_stale(self, now):
+        """mutex를 잡은 상태에서 호출한다. 등급마다 앞쪽(가장 오래된)부터 deadline이 지난 채팅을 버린다."""
+        for name, lane in self.lanes:
+            deadline = self.classes[name]["deadline"]
+            while lane and now - lane[0].get("received_at", now) > deadline:
+                lane.popleft()
+                self.discard("stale")
+
+    def discard(self, reason):
+        self.size -= 1
+        self.unfinished_tasks -= 1
+        metrics.inc("terry_chat_dropped_total", reason=reason)
+
+    def get(self, block=True, timeout=None):
+        with self.not_empty:
+            end = None if timeout is None else time.monotonic() + timeout
+            while True:
+                self.drop_stale(time.time())
+                for name, lane in self.lanes:
+                    if lane:
+                        item = lane.popleft()
+                        self.size -= 1
+                        metrics.observe("terry_schedule_wait_seconds",
+                                        time.time() - item.get("received_at", time.time()), priority=name)
+                        return item
+                if not block:
+                    raise queue.Empty
+                if end is None:
+                    self.not_empty.wait()
+                    continue
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    raise queue.Empty
+                self.not_empty.wait(remaining)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def task_done(self):
+        with self.mutex:
+            if self.unfinished_tasks <= 0:
+                raise ValueError("task_done() called too many times")
+            self.unfinished_tasks -= 1
+
+    def qsize(self):
+        with self.mutex:
+            return self.size
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def depths(self):
+        with self.mutex:
+            return {name: len(lane) for name, lane in self.lanes}
@@ -0,0 +1,45 @@
+# sentence_chunker.py
+
+import re
+
+# 문장 끝 문장부호(한국어/영어/일본어) 뒤에 공백이 오거나, 줄바꿈이 나오면 문장이 끝난 것으로 본다.
+# 토큰이 조금씩 들어오므로 "3.5"처럼 뒤에 공백이 없는 마침표에서는 자르지 않는다.
+SENTENCE_END = re.compile(r'[.!?。！？…~]+["\'」』)\]]*\s+|\n+')
+SOFT_BREAK = re.compile(r'[,，、]\s+|\s+')
+
+
+class SentenceChunker:
+    """LLM 스트리밍 토큰을 모아서 완성된 문장 단위로 잘라주는 클래스."""
+
+    def __init__(self, min_length=8, max_length=200):
+        self.min_length = min_length  # 너무 짧은 문장은 다음 문장과 합쳐서 TTS 호출 수를 줄인다
+        self.max_length = max_length  # 문장부호 없이 길어지면 쉼표/공백에서 강제로 자른다
+        self.buffer = ""
+
+    def feed(self, token):
+        """토큰을 추가하고, 새로 완성된 문장 목록을 돌려준다."""
+        self.buffer += token
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            sentence = self.buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_length:
+                sentences.append(sentence)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+
+        while len(self.buffer) > self.max_length:
+            cut = None
+            for match in SOFT_BREAK.finditer(self.buffer, 0, self.max_length):
+                cut = match.end()
+            if not cut:
+                cut = self.max_length
+            sentences.append(self.buffer[:cut].strip())
+            self.buffer = self.buffer[cut:]
+        return sentences
+
+    def flush(self):
+        """스트림이 끝났을 때 남은 문장을 돌려준다."""
+        sentence = self.buffer.strip()
+        self.buffer = ""
+        return sentence
@@ -1,90 +1,131 @@
 import argparse
-import datetime
+import atexit
 import json
 import logging
-import os
+import queue
 import random
 import threading
 import time
-import io
-from collections import deque, defaultdict
-
-import requests
-from pydub import AudioSegment
-from pydub.playback import play
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from deep_translator import GoogleTranslator
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
 import pytchat
 from websocket import WebSocket, WebSocketConnectionClosedException
 
 import ollama
 from cmd_type import CHZZK_CHAT_CMD
-from api import fetch_userIdHash, fetch_chatChannelId, fetch_channelName, fetch_accessToken
+from pipeline import ResponsePipeline
+from chat_filter import ChatFilter
+from sentence_chunker import SentenceChunker
+from prompt_builder import PromptBuilder
+from language import CachedTranslator, detect_language
+from tts import ElevenLabsTTS, SpeechStream
+from tts_cache import TTSCache
+from user_memory import UserMemoryStore
+from audio_player import AudioPlayer
+from reconnect import Backoff, SeenMessages
+from chzzk_decoder import ChzzkDecoder
+from metrics import metrics, start_metrics
+from log_writer import LogWriter
+from long_term_memory import LongTermMemory
+from response_cache import ResponseCache
+from scheduler import ChatScheduler
+from idle_scheduler import IdleScheduler
+from lipsync import start_lipsync
+from cookies_manager import login_with_browser, check_login, load_cookies, CredentialRefresher
+from api import fetch_userIdHash, fetch_chatChannelId, fetch_channelName, fetch_accessToken, ChannelStatusPoller, CHZZK_CHAT_URL
 
 def get_logger():
     formatter = logging.Formatter('%(message)s')
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
-    file_handler = logging.FileHandler('chat.log', mode="w")
+    # 재시작해도 이전 로그가 지워지지 않도록 이어쓰고, 10MB마다 chat.log.1 ... 로 넘긴다
+    file_handler = RotatingFileHandler('chat.log', mode="a", maxBytes=10 * 1024 * 1024, backupCount=5,
+                                       encoding="utf-8")
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+
+    # 수집 스레드는 큐에 넣기만 하고, 파일/콘솔 출력은 listener 스레드가 한다
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
 
     return logger
 
 class ChzzkChat:
+    chat_url = CHZZK_CHAT_URL
+    token_ttl = 60 * 60  # 이 시간 안에 다시 연결하면 accessToken을 다시 받지 않는다
+
     def __init__(self, streamer, cookies, logger, chatbot):
         self.streamer = streamer.rstrip('\\')
         self.cookies = cookies
         self.logger = logger
         self.chatbot = chatbot
         self.sid = None
-        self.update_cookies()
-        self.userIdHash = fetch_userIdHash(self.cookies)
-        self.chatChannelId = fetch_chatChannelId(self.streamer, self.cookies)
-        self.channelName = fetch_channelName(self.streamer)
-        self.accessToken, self.extraToken = fetch_accessToken(self.chatChannelId, self.cookies)
+        self.backoff = Backoff()
+        self.seen = SeenMessages()
+        self.decoder = ChzzkDecoder()
+        self.fill_gap = False  # 처음 연결할 때 받은 최근 채팅은 이미 지난 것이라 대답하지 않는다
+        self.bootstrap()
+        self.poller = ChannelStatusPoller(self.streamer, self.cookies, self.chatChannelId)
+        self.poller.start()
+        # 쿠키 만료/토큰 만료를 백그라운드에서 확인하고, 새 값을 이 객체와 poller에 바로 넣는다
+        self.refresher = CredentialRefresher(self.cookies, **self.chatbot.config.get("credentials", {}))
+        self.refresher.attach_chat(self)
+        self.refresher.attach(self.poller)
+        self.refresher.start()
         self.sock = None
         self.connect()
 
-    def update_cookies(self):
-        try:
-            options = webdriver.ChromeOptions()
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-            driver.get('https://chzzk.naver.com/live/34edb106b3fba99451c269a95a39c49a')
-
-            input("로그인 후 Enter를 눌러주세요...")
-
-            cookies = driver.get_cookies()
-            nid_aut = next(cookie['value'] for cookie in cookies if cookie['name'] == 'NID_AUT')
-            nid_ses = next(cookie['value'] for cookie in cookies if cookie['name'] == 'NID_SES')
+    def bootstrap(self):
+        """
+        로그인 확인, chatChannelId, 채널 이름을 동시에 요청한다.
+        저장된 쿠키가 유효하면 브라우저를 띄우지 않고, 서버가 로그인을 거부했을 때만 update_cookies로 다시 로그인한다.
+        네트워크 오류는 check_login이 몇 번 다시 시도하고, 그래도 안 되면 쿠키를 버리지 않고 예외로 멈춘다.
+        """
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            user_future = pool.submit(check_login, self.cookies)
+            channel_future = pool.submit(fetch_chatChannelId, self.streamer, self.cookies)
+            name_future = pool.submit(fetch_channelName, self.streamer)
 
-            updated_cookies = {
-                "NID_AUT": nid_aut,
-                "NID_SES": nid_ses
-            }
+            self.userIdHash = user_future.result()
+            if self.userIdHash is None:
+                print("저장된 쿠키가 없거나 만료되어 브라우저로 로그인합니다.")
+                self.update_cookies()
+                self.userIdHash = fetch_userIdHash(self.cookies)
+            self.chatChannelId = channel_future.result()
+            self.channelName = name_future.result()
 
-            with open("cookies.json", "w", encoding='utf-8') as json_file:
-                json.dump(updated_cookies, json_file, indent=4, ensure_ascii=False)
+        self.renew_token()
 
-            self.cookies = updated_cookies
-            driver.quit()
-            print("쿠키 갱신 완료!")
+    def update_cookies(self):
+        try:
+            self.cookies = login_with_browser()
         except Exception as e:
             print(f"Failed to update cookies: {e}")
 
-    def connect(self):
-        self.chatChannelId = fetch_chatChannelId(self.streamer, self.cookies)
+    def refresh_token(self):
+        """채널이 바뀌었거나 토큰이 오래됐을 때만 accessToken을 새로 받는다."""
+        chatChannelId = self.poller.chatChannelId or self.chatChannelId
+        if chatChannelId != self.chatChannelId or time.time() - self.token_time > self.token_ttl:
+            self.chatChannelId = chatChannelId
+            self.renew_token()
+
+    def renew_token(self):
         self.accessToken, self.extraToken = fetch_accessToken(self.chatChannelId, self.cookies)
+        self.token_time = time.time()
+
+    def connect(self):
+        self.refresh_token()
 
         self.sock = WebSocket()
-        self.sock.connect('wss://kr-ss1.chat.naver.com/chat')
+        self.sock.connect(self.chat_url)
         print(f'{self.channelName} 채팅창에 연결 중 .', end="")
 
         default_dict = {
@@ -109,6 +150,7 @@ class ChzzkChat:
         self.sid = sock_response['bdy']['sid']
         print(f'\r{self.channelName} 채팅창에 연결 중 ..', end="")
 
+        # 응답은 run 루프에서 다른 메시지와 함께 처리해서, 끊겨 있던 동안의 채팅을 채운다
         send_dict = {
             "cmd": CHZZK_CHAT_CMD['request_recent_chat'],
             "tid": 2,
@@ -119,7 +161,6 @@ class ChzzkChat:
         }
 
         self.sock.send(json.dumps(dict(send_dict, **default_dict)))
-        self.sock.recv()
         print(f'\r{self.channelName} 채팅창에 연결 중 ...')
 
         if self.sock.connected:
@@ -127,70 +168,119 @@ class ChzzkChat:
         else:
             raise ValueError('오류 발생')
 
+    def reconnect(self):
+        """jitter가 섞인 지수 backoff로 다시 연결한다. 한 번 실패하면 토큰도 새로 받는다."""
+        metrics.inc("terry_reconnects_total", platform="Chzzk")
+        while True:
+            try:
+                self.connect()
+                self.backoff.reset()
+                return
+            except Exception as e:
+                delay = self.backoff.next_delay()
+                print(f"재연결 실패: {e}, {delay:.1f}초 후 다시 시도합니다.")
+                self.token_time = 0
+                self.refresher.last_check = 0  # 쿠키 만료 때문일 수 있으니 다음 tick에 바로 확인한다
+                time.sleep(delay)
+
+    def handle_frame(self, raw_message):
+        """웹소켓 메시지 하나를 처리한다. 새 채팅이 있었으면 True."""
+        chat_cmd, records = self.decoder.decode(raw_message)
+
+        if chat_cmd == CHZZK_CHAT_CMD['ping']:
+            self.sock.send(
+                json.dumps({
+                    "ver": "2",
+                    "cmd": CHZZK_CHAT_CMD['pong']
+                })
+            )
+            # 채널 상태 확인은 poller 스레드가 하고, 여기서는 캐시된 값만 비교한다
+            if self.poller.chatChannelId and self.chatChannelId != self.poller.chatChannelId:
+                self.reconnect()
+            return False
+
+        if chat_cmd == CHZZK_CHAT_CMD['recent_chat'] and not self.fill_gap:
+            # 처음 연결할 때 받은 최근 채팅은 처리한 것으로만 표시한다
+            for record in records:
+                self.seen.add(record.key)
+            self.fill_gap = True
+            return False
+
+        handled = False
+        for record in records:
+            handled = self.handle_chat(record) or handled
+        return handled
+
+    def handle_chat(self, record):
+        # 재연결 직후 최근 채팅과 실시간 채팅이 겹치므로 (uid, msgTime)으로 한 번만 처리한다
+        if not self.seen.add(record.key):
+            metrics.inc("terry_chat_dropped_total", reason="seen")
+            return False
+
+        if record.message.startswith("!노래"):
+            self.chatbot.sing_song()
+
+        self.logger.info(f'[{self.decoder.format_time(record.msg_time)}][{record.chat_type}] {record.nickname} : {record.message}')
+        self.chatbot.handle_message(record.nickname, record.message, "ko", "Chzzk", chat_type=record.chat_type)
+        return True
+
     def run(self):
-        last_chat_time = time.time()
+        # 혼잣말은 ChatBot.idle 타이머가 맡으므로 여기서는 수신만 한다
         while True:
             try:
                 if self.sock.connected:
-                    raw_message = self.sock.recv()
-                    raw_message = json.loads(raw_message)
-                    chat_cmd = raw_message['cmd']
-
-                    if chat_cmd == CHZZK_CHAT_CMD['ping']:
-                        self.sock.send(
-                            json.dumps({
-                                "ver": "2",
-                                "cmd": CHZZK_CHAT_CMD['pong']
-                            })
-                        )
-                        if self.chatChannelId != fetch_chatChannelId(self.streamer, self.cookies):
-                            self.connect()
-                        continue
-
-                    if chat_cmd in [CHZZK_CHAT_CMD['chat'], CHZZK_CHAT_CMD['donation']]:
-                        chat_type = '채팅' if chat_cmd == CHZZK_CHAT_CMD['chat'] else '후원'
-                        for chat_data in raw_message['bdy']:
-                            nickname = '익명의 후원자' if chat_data['uid'] == 'anonymous' else json.loads(chat_data['profile'])["nickname"]
-                            message = chat_data.get('msg', '')
-
-                            if message.startswith("!노래"):
-                                self.chatbot.sing_song()
-
-                            now = datetime.datetime.fromtimestamp(chat_data['msgTime'] / 1000)
-                            now = datetime.datetime.strftime(now, '%Y-%m-%d %H:%M:%S')
-
-                            self.logger.info(f'[{now}][{chat_type}] {nickname} : {message}')
-                            self.chatbot.handle_message(nickname, message, "ko", "Chzzk")
-                            last_chat_time = time.time()
+                    # recv 시간에는 채팅이 없어서 기다린 시간도 들어간다
+                    with metrics.span("chzzk_recv"):
+                        raw_message = self.sock.recv()
+                    with metrics.span("chzzk_handle"):
+                        self.handle_frame(raw_message)
                 else:
                     print("Socket is not connected, reconnecting...")
-                    self.connect()
-
-                # 혼잣말 트리거
-                if time.time() - last_chat_time > 60:  # 60초 동안 채팅이 없을 때
-                    self.chatbot.mutter_to_self()
-                    last_chat_time = time.time()
+                    self.reconnect()
 
             except WebSocketConnectionClosedException:
                 print("WebSocket connection closed, reconnecting...")
-                self.connect()
+                self.reconnect()
             except Exception as e:
                 print(f"Error during run: {e}")
                 pass
 
 class ChatBot:
+    SELF_THOUGHTS = [
+        "아무도 말을 안 걸어주네... 그냥 혼잣말이나 해야겠다.",
+        "지금 무슨 생각을 하고 있었더라... 아, 맞아!",
+        "이 게임은 언제 해도 정말 재밌어.",
+        "음, 뭐 재미있는 일이 없을까?",
+        "테리야, 넌 정말 대단해! (혼잣말)"
+    ]
+    CONTINUATIONS = [
+        "그럼 다음에 대해 더 이야기해볼까요?",
+        "이 주제에 대해 더 알고 싶으신가요?",
+        "그럼, 계속해서 이야기해볼게요.",
+        "이 부분이 흥미롭네요, 좀 더 이야기해보죠."
+    ]
+    INCOMPLETE_SUFFIX = "제가 더 이야기할게 있어요. 어떤 이야기를 계속 할까요?"
+
     def __init__(self):
         with open("config.json", "r") as json_file:
             self.config = json.load(json_file)
 
         self.llama_model = self.config["llama3"]["model"]
         self.system_message = self.config["llama3"]["system_message"]
+        self.stream_responses = self.config["llama3"].get("stream", False)
+        self.prompt_builder = PromptBuilder(self.system_message, **self.config["llama3"].get("prompt", {}))
+        # num_ctx를 고정해야 ollama가 모델을 다시 올리지 않고 앞부분 KV 캐시를 재사용한다
+        self.llm_options = dict(self.config["llama3"].get("parameters", {}))
+        self.llm_options["num_ctx"] = self.config["llama3"].get("num_ctx", 4096)
+        self.keep_alive = self.config["llama3"].get("keep_alive", "30m")
         self.eleven_labs_config = self.config["eleven_labs"]
 
         self.conversation_history = deque(maxlen=20)
-        self.memory = defaultdict(list)
-        self.log_file = open("chat_log.txt", "a", encoding="utf-8")
-        self.translator = GoogleTranslator(source='auto', target='ko')
+        self.channels = {}  # 여러 채널을 한 프로세스에서 돌릴 때 채널별 대화 기록/페르소나
+        self.user_memory = UserMemoryStore(**self.config.get("user_memory", {}))
+        self.long_term_memory = LongTermMemory(**self.config.get("long_term_memory", {}))
+        self.log_writer = LogWriter(**self.config.get("log_writer", {}))
+        self.translator = CachedTranslator(**self.config.get("translation", {}))
         self.voice_lock = threading.Lock()
         self.music_lock = threading.Lock()
         self.is_playing_music = False
@@ -199,77 +289,283 @@ class ChatBot:
         self.last_greeting_time = 0  # 마지막 인사 시간
         self.greeting_done = False  # 인사를 한 번 했는지 여부를 저장
         self.recent_responses = deque(maxlen=5)
-        self.last_processed_message = None
+        self.last_processed_messages = {}  # (플랫폼, 채널) -> 마지막으로 받은 메시지
         self.greeting_cooldown = 600  # 10분 동안 인사말 무시
-
-    def handle_message(self, author, message, language, platform):
+        self.chat_filter = ChatFilter(**self.config.get("chat_filter", {}))
+        self.response_cache = ResponseCache(**self.config.get("response_cache", {}))
+
+        cache_config = self.config.get("tts_cache", {})
+        self.tts_cache = TTSCache(cache_config.get("dir", "tts_cache"), cache_config.get("max_mb", 200) * 1024 * 1024)
+        self.tts = ElevenLabsTTS(self.eleven_labs_config, self.tts_cache)
+        self.lipsync = start_lipsync(self.tts.sample_rate, **self.config.get("lipsync", {}))
+        self.player = AudioPlayer(self.tts.sample_rate, lipsync=self.lipsync)
+        if cache_config.get("prewarm", True):
+            # 혼잣말, 이어말하기 같은 고정 문장은 미리 합성해두고 네트워크를 다시 타지 않는다
+            threading.Thread(target=self.tts.prewarm, args=(self.fixed_phrases(),), daemon=True).start()
+
+        pipeline_config = self.config.get("pipeline", {})
+        scheduler_config = dict(self.config.get("scheduler", {}))
+        # 후원, Terry를 부르는 채팅, 처음 온 시청자를 먼저 대답하고 너무 오래된 채팅은 버린다
+        self.mention_names = [name.lower() for name in scheduler_config.pop("mention_names", ["테리", "terry"])]
+        self.scheduler = ChatScheduler(**scheduler_config)
+        self.pipeline = ResponsePipeline(self, ingest_queue=self.scheduler, **pipeline_config)
+        self.pipeline.start()
+
+        metrics.gauge("terry_queue_depth", self.pipeline.queue_depths, "queue")
+        metrics.gauge("terry_schedule_depth", self.scheduler.depths, "priority")
+
+        # 채팅이 조용할 때 혼잣말을 하고, 그 전에 틈틈이 혼잣말을 만들어 합성해둔다
+        self.idle = IdleScheduler(self, **self.config.get("idle", {}))
+        self.idle.start()
+        start_metrics(**self.config.get("metrics", {}))
+
+    def register_channel(self, name, system_message=None):
+        self.channels[name] = {"system_message": system_message, "history": deque(maxlen=20)}
+
+    def history_for(self, channel):
+        if channel is None:
+            return self.conversation_history
+        if channel not in self.channels:
+            self.register_channel(channel)
+        return self.channels[channel]["history"]
+
+    def persona_for(self, channel):
+        return self.channels.get(channel, {}).get("system_message")
+
+    def handle_message(self, author, message, language, platform, channel=None, chat_type='채팅'):
+        """수집 스레드에서 호출된다. 가벼운 검사만 하고 파이프라인 대기열에 넣는다."""
+        metrics.inc("terry_chat_received_total", platform=platform)
+        self.idle.touch()
         if self.is_playing_music:
+            metrics.inc("terry_chat_dropped_total", reason="music")
             return
 
         if self.ignore_chat:
+            metrics.inc("terry_chat_dropped_total", reason="ignore")
             return
 
-        if message == self.last_processed_message:
+        source = (platform, channel)
+        if message == self.last_processed_messages.get(source):
             print(f"반복된 메시지: {message}, 무시됨.")
+            metrics.inc("terry_chat_dropped_total", reason="repeat")
+            return
+
+        self.last_processed_messages[source] = message
+
+        # 도배, 복붙, 같은 사람의 연속 채팅은 LLM을 부르기 전에 거른다 (후원은 거르지 않는다)
+        reason = None if chat_type == '후원' else self.chat_filter.check(author, message, platform, channel)
+        if reason:
+            print(f"필터링된 메시지 ({reason}): {message}")
+            metrics.inc("terry_chat_dropped_total", reason=reason)
             return
 
-        self.last_processed_message = message
-        self.conversation_history.append({"role": "user", "content": f"{author}: {message}"})
+        submitted = self.pipeline.submit({
+            "author": author,
+            "message": message,
+            "language": language,
+            "platform": platform,
+            "channel": channel,
+            "chat_type": chat_type,
+            "priority": self.chat_priority(author, message, chat_type),
+            "received_at": time.time(),
+        })
+        if not submitted:
+            metrics.inc("terry_chat_dropped_total", reason="queue_full")
+
+    def chat_priority(self, author, message, chat_type):
+        """스케줄러 등급을 정한다: 후원 > Terry 언급 > 처음 온 시청자 > 일반 채팅."""
+        if chat_type == '후원':
+            return "donation"
+        lowered = message.lower()
+        if any(name in lowered for name in self.mention_names):
+            return "mention"
+        if not self.user_memory.is_known(author):
+            return "new_viewer"
+        return "chat"
+
+    def prepare_message(self, item):
+        """대화 기록을 갱신하고, 이 메시지에 대답해야 하는지 판단한다."""
+        author, message = item["author"], item["message"]
+        self.history_for(item.get("channel")).append({"role": "user", "content": f"{author}: {message}"})
+        # 저장하기 전에 읽어야 현재 메시지가 "User data"와 마지막 user 메시지에 두 번 들어가지 않는다
+        item["user_data"] = self.load_user_data(author)
         self.save_user_history(author, message)
-        user_data = self.load_user_data(author)
 
         # 인사말인지 여부를 체크하고, 인사말이 중복되는지 판단
         if self.is_greeting(message):
             if self.greeting_done and (time.time() - self.last_greeting_time < self.greeting_cooldown):
                 print(f"인사말 중복 감지: {message}, 무시됨.")
-                return
             else:
                 self.greeting_done = True
                 self.last_greeting_time = time.time()
+            return False
+
+        # 인사말이 아니므로 질문에 우선 응답
+        return True
+
+    def process_message(self, item):
+        """파이프라인 LLM 단계: 메시지 하나에 대한 응답을 생성한다."""
+        if self.prepare_message(item):
+            yield from self.respond(item)
+
+    def process_batch(self, items):
+        """파이프라인 LLM 단계 (묶음 모드): 비슷한 시간에 들어온 채팅을 한 번의 LLM 호출로 대답한다."""
+        # 채널마다 대화 맥락과 페르소나가 다르므로 같은 채널끼리만 묶는다
+        channels = {}
+        for item in items:
+            if self.prepare_message(item):
+                channels.setdefault(item.get("channel"), []).append(item)
+        for channel_items in channels.values():
+            yield from self.respond_batch(channel_items)
+
+    def respond_batch(self, items):
+        if len(items) == 1:
+            yield from self.respond(items[0])
+            return
+
+        print(f"채팅 {len(items)}개를 한 번에 대답합니다.")
+        metrics.observe("terry_batch_size", len(items))
+        merged = dict(
+            items[0],
+            author=", ".join(dict.fromkeys(item["author"] for item in items)),
+            message="\n".join(item["message"] for item in items),
+            language='ko' if any(item["language"] == 'ko' for item in items) else items[0]["language"],
+            batch_size=len(items),
+            received_times=[item["received_at"] for item in items],
+        )
+        yield from self.generate_items(merged, self.build_batch_messages(items))
+
+    def respond(self, item):
+        # 자주 나오는 질문은 예전 대답을 문장 그대로 다시 보낸다 (LLM, 번역을 건너뛰고 문장별 TTS 캐시에 맞는다)
+        cached = self.response_cache.get(item["message"], item.get("channel"), exclude=self.recent_responses)
+        if cached is not None:
+            metrics.inc("terry_response_cache_total", result="hit")
+            for index, sentence in enumerate(cached):
+                yield dict(item, text=sentence, stream=True, first=index == 0, cached=True)
+            return
+        metrics.inc("terry_response_cache_total", result="miss")
+
+        user_data = item["user_data"]
+        messages = self.build_messages(item["author"], item["message"], user_data, item.get("channel"))
+        if user_data:
+            # 시청자 정보를 보고 만든 대답은 다른 시청자에게 다시 쓰면 안 되므로 캐시하지 않는다
+            yield from self.generate_items(item, messages)
+            return
+        # 번역 단계에서 완성된 문장을 여기에 모았다가, 마지막 표시 항목을 받으면 캐시에 넣는다
+        yield from self.generate_items(dict(item, cache_entry={"sentences": [], "complete": True}), messages)
+
+    def generate_items(self, item, messages):
+        if self.stream_responses:
+            # 문장이 완성될 때마다 바로 번역/TTS 단계로 넘긴다
+            sentences = []
+            for index, sentence in enumerate(self.generate_response_stream(messages)):
+                sentences.append(sentence)
+                yield dict(item, text=sentence, stream=True, first=index == 0)
+            self.remember(item, " ".join(sentences))
         else:
-            # 인사말이 아니므로 질문에 우선 응답
-            response = self.generate_response(author, message, platform, language, user_data)
-            if response in self.recent_responses:
-                print(f"중복된 응답 발견: {response}")
-                return
-            self.recent_responses.append(response)
+            response_text = self.generate_response(messages)
+            self.remember(item, response_text)
+            yield dict(item, text=response_text)
+
+        if "cache_entry" in item:
+            yield dict(item, text=None)
+
+    def finalize_response(self, item):
+        """파이프라인 번역 단계: 번역, 중복 응답 검사, 이어말하기를 처리한다."""
+        if item["text"] is None:
+            # 응답이 끝났다는 표시. 번역 단계는 스레드 하나라 앞 문장들은 이미 모두 처리됐다
+            entry = item["cache_entry"]
+            # 중간 문장이 빠졌거나 질문한 시청자를 부른 대답은 다른 시청자에게 그대로 쓸 수 없다
+            if entry["complete"] and not any(item["author"] in sentence for sentence in entry["sentences"]):
+                self.response_cache.put(item["message"], item.get("channel"), entry["sentences"])
+            return
+
+        response = item["text"]
+        if item["language"] == 'ko' and not item.get("cached"):
+            # 이미 한국어로 답했으면 번역기를 거치지 않는다
+            with metrics.span("translate"):
+                response = self.translator.translate(response, 'ko')
+
+        if response in self.recent_responses:
+            print(f"중복된 응답 발견: {response}")
+            metrics.inc("terry_responses_dropped_total", reason="duplicate")
+            if "cache_entry" in item:
+                item["cache_entry"]["complete"] = False
+            return
+        self.recent_responses.append(response)
+
+        # 스트리밍 응답은 LLM 단계에서 전체 문장을 보고 이어말하기를 결정한다
+        if not item.get("stream") and not item.get("cached") and self.should_continue_speaking(response):
+            continuation = self.generate_continuation()
+            response += " " + continuation
 
-            if self.should_continue_speaking(response):
-                continuation = self.generate_continuation()
-                response += " " + continuation
+        if "cache_entry" in item:
+            item["cache_entry"]["sentences"].append(response)
 
-            print(f"Terry: {response}")
-            self.log_chat(f"Terry: {response}")
-            self.play_response(response, language)
+        print(f"Terry: {response}")
+        self.log_chat(f"Terry: {response}")
+        yield dict(item, text=response)
 
     def is_greeting(self, message):
         """메시지가 인사말인지 판단하는 함수."""
         greetings = ["안녕하세요", "환영합니다", "사랑스러운 시청자"]
         return any(greeting in message for greeting in greetings)
 
-    def generate_response(self, author, message, platform, language, user_data):
-        # 대화 생성 로직
-        messages = [{"role": "system", "content": self.system_message}]
-        messages.extend(self.conversation_history)
-        messages.append({"role": "user", "content": f"User data: {user_data}"})
+    def build_messages(self, author, message, user_data, channel=None):
+        return self.prompt_builder.build(self.history_for(channel), author, message, user_data,
+                                         self.persona_for(channel), self.recall_memory(message))
 
-        response_variants = [
-            {"role": "user", "content": f"{author}: {message}"},
-            {"role": "user", "content": f"{author} asked about: {message}"},
-            {"role": "user", "content": f"{message} - asked by {author}"}
-        ]
+    def build_batch_messages(self, items):
+        channel = items[0].get("channel")
+        memories = self.recall_memory("\n".join(item["message"] for item in items))
+        return self.prompt_builder.build_batch(self.history_for(channel), items, self.persona_for(channel),
+                                               memories)
 
-        messages.extend(response_variants)
+    def chat_llm(self, messages, stream=False):
+        metrics.inc("terry_llm_calls_total")
+        return ollama.chat(model=self.llama_model, messages=messages, stream=stream,
+                           options=self.llm_options, keep_alive=self.keep_alive)
 
-        response = ollama.chat(model=self.llama_model, messages=messages)
+    def generate_response(self, messages):
+        # 대화 생성 로직
+        with metrics.span("llm"):
+            response = self.chat_llm(messages)
         response_text = response['message']['content']
 
-        response_text = self.ensure_complete_response(response_text)
-        response_text = self.recall_memory(message, response_text)
-        if language == 'ko':
-            response_text = self.translator.translate(response_text)
-
-        return response_text
+        return self.ensure_complete_response(response_text)
+
+    def generate_response_stream(self, messages):
+        """LLM 토큰을 스트리밍으로 받아 문장 단위로 yield 하는 함수."""
+        chunker = SentenceChunker()
+        sentences = []
+
+        # 다음 단계 큐가 차서 yield에서 기다린 시간은 빼고, LLM을 기다린 시간만 더한다
+        start = resumed = time.perf_counter()
+        llm_seconds = 0.0
+        for part in self.chat_llm(messages, stream=True):
+            now = time.perf_counter()
+            if llm_seconds == 0.0:
+                metrics.observe("terry_llm_first_token_seconds", now - start)
+            llm_seconds += now - resumed
+            for sentence in chunker.feed(part['message']['content']):
+                sentences.append(sentence)
+                yield sentence
+            resumed = time.perf_counter()
+        metrics.observe("terry_stage_seconds", llm_seconds, stage="llm")
+
+        last_sentence = chunker.flush()
+        if last_sentence:
+            sentences.append(last_sentence)
+            yield last_sentence
+
+        # 전체 응답을 기준으로 덧붙일 문장이 있으면 마지막에 이어서 보낸다
+        response_text = " ".join(sentences)
+        completed = self.ensure_complete_response(response_text)
+        extra = completed[len(response_text):].strip()
+        if extra:
+            yield extra
+        if self.should_continue_speaking(completed):
+            yield self.generate_continuation()
 
     def ensure_complete_response(self, response_text):
         """
@@ -277,7 +573,7 @@ class ChatBot:
         """
         incomplete_indicators = ["...", "그런데", "그리고", "그래서", "아마도", "어쩌면"]  # 문장이 중단될 가능성이 있는 패턴들
         if response_text.strip().endswith(tuple(incomplete_indicators)) or len(response_text.split()) < 5:
-            response_text += " 제가 더 이야기할게 있어요. 어떤 이야기를 계속 할까요?"
+            response_text += " " + self.INCOMPLETE_SUFFIX
         return response_text
 
     def should_continue_speaking(self, response):
@@ -288,23 +584,19 @@ class ChatBot:
 
     def generate_continuation(self):
         # 추가적인 대화를 생성
-        continuations = [
-            "그럼 다음에 대해 더 이야기해볼까요?",
-            "이 주제에 대해 더 알고 싶으신가요?",
-            "그럼, 계속해서 이야기해볼게요.",
-            "이 부분이 흥미롭네요, 좀 더 이야기해보죠."
-        ]
-        return random.choice(continuations)
-
-    def recall_memory(self, message, response_text):
-        """기억을 더 효과적으로 사용하여 반복되지 않도록 함."""
-        if any(topic in message for topic in self.memory):
-            for topic, messages in self.memory.items():
-                if topic in message:
-                    if len(messages) > 0:
-                        response_text += f" 예전에 {topic}에 대해 이런 대화를 했었죠: {random.choice(messages)}"
-                    break
-        return response_text
+        return random.choice(self.CONTINUATIONS)
+
+    def fixed_phrases(self):
+        """TTS 캐시에 미리 넣어둘 고정 문장 목록."""
+        return self.SELF_THOUGHTS + self.CONTINUATIONS + [self.INCOMPLETE_SUFFIX]
+
+    def recall_memory(self, message):
+        """지난 방송에서 이 메시지와 비슷했던 대화를 찾아 프롬프트에 넣을 수 있게 돌려준다."""
+        return self.long_term_memory.search(message)
+
+    def remember(self, item, response_text):
+        if response_text:
+            self.long_term_memory.add(item["author"], item["message"], response_text)
 
     def fetch_youtube_chat(self, video_id):
         try:
@@ -322,10 +614,7 @@ class ChatBot:
             print(f"Error fetching YouTube chat: {e}")
 
     def detect_language(self, text):
-        try:
-            return detect(text)
-        except:
-            return 'unknown'
+        return detect_language(text)
 
     def filter_response(self, response):
         response = response.replace("여보", "").replace("고백", "").strip()
@@ -337,52 +626,69 @@ class ChatBot:
             response = response[:max_length] + "..."
         return response
 
+    def synthesize(self, item):
+        """파이프라인 TTS 단계: 합성을 시작만 하고 바로 넘긴다. 앞 문장 재생 중에 다음 문장이 미리 받아진다."""
+        yield dict(item, audio=self.tts.open_stream(item["text"]))
+
+    def playback(self, item):
+        """파이프라인 재생 단계: 바이트가 도착하는 대로 재생한다."""
+        with self.voice_lock:
+            started = time.time()
+            with metrics.span("playback"):
+                self.player.play(item["audio"])
+
+        # 채팅을 받은 때부터 그 대답의 첫 소리가 나기까지. 묶음 대답은 묶인 채팅마다 하나씩 기록한다
+        first_chunk_at = item["audio"].first_chunk_at
+        received = item.get("received_times") or ([item["received_at"]] if "received_at" in item else [])
+        if item.get("first", True) and first_chunk_at is not None:
+            for received_at in received:
+                metrics.observe("terry_chat_to_audio_seconds", max(started, first_chunk_at) - received_at)
+
     def play_response(self, message, language):
         with self.voice_lock:
-            url = f'https://api.elevenlabs.io/v1/text-to-speech/{self.eleven_labs_config["voice_id"]}'
-            headers = {
-                'accept': 'audio/mpeg',
-                'xi-api-key': self.eleven_labs_config["api_key"],
-                'Content-Type': 'application/json'
-            }
-            data = {
-                'text': message,
-                'model_id': self.eleven_labs_config["model_id"],
-                'voice_settings': self.eleven_labs_config["voice_settings"]
-            }
-            response = requests.post(url, headers=headers, json=data, stream=True)
-            audio_content = AudioSegment.from_file(io.BytesIO(response.content), format="mp3")
-            play(audio_content)
+            self.player.play(self.tts.open_stream(message))
 
     def mutter_to_self(self):
-        self_thoughts = [
-            "아무도 말을 안 걸어주네... 그냥 혼잣말이나 해야겠다.",
-            "지금 무슨 생각을 하고 있었더라... 아, 맞아!",
-            "이 게임은 언제 해도 정말 재밌어.",
-            "음, 뭐 재미있는 일이 없을까?",
-            "테리야, 넌 정말 대단해! (혼잣말)"
-        ]
-        random_thought = random.choice(self_thoughts)
-        print(f"Terry 혼잣말: {random_thought}")
-        self.log_chat(f"Terry 혼잣말: {random_thought}")
-        self.play_response(random_thought, "ko")
+        prepared = self.idle.take()
+        if prepared is None:
+            # 미리 만들어둔 혼잣말이 없으면 고정 문장을 쓴다 (TTS 캐시에 미리 들어 있다)
+            random_thought = random.choice(self.SELF_THOUGHTS)
+            print(f"Terry 혼잣말: {random_thought}")
+            self.log_chat(f"Terry 혼잣말: {random_thought}")
+            self.pipeline.speak(random_thought, "ko")
+            return
+
+        metrics.inc("terry_idle_used_total")
+        print(f"Terry 혼잣말: {prepared['text']}")
+        self.log_chat(f"Terry 혼잣말: {prepared['text']}")
+        self.recent_responses.append(prepared["text"])
+        audio = SpeechStream(prepared["text"], self.tts.sample_rate)
+        audio.put(prepared["pcm"])
+        audio.close()
+        self.pipeline.play({"text": prepared["text"], "language": "ko", "audio": audio})
+
+    def generate_mutter(self, pending_lines=()):
+        """조용할 때 할 혼잣말을 LLM으로 만든다. 이미 쌓아둔 것, 최근에 한 말과는 겹치지 않게 한다."""
+        avoid = list(pending_lines) + list(self.recent_responses)[-3:]
+        messages = self.prompt_builder.build_mutter(self.history_for(None), self.persona_for(None), avoid)
+        with metrics.span("idle_llm"):
+            response = self.chat_llm(messages)
+        text = response['message']['content']
+        text = self.translator.translate(text, 'ko')
+        text = self.shorten_response(self.filter_response(text))
+        if text in self.recent_responses:
+            return None
+        return text
 
     def save_user_history(self, author, message):
-        filename = f"user_data/{author}_history.txt"
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "a", encoding="utf-8") as file:
-            file.write(f"{datetime.datetime.now()}: {message}\n")
+        self.user_memory.add(author, message)
 
     def load_user_data(self, author):
-        filename = f"user_data/{author}_history.txt"
-        if os.path.exists(filename):
-            with open(filename, "r", encoding="utf-8") as file:
-                return file.read()
-        return ""
+        """최근 메시지 몇 개와 요약만 돌려준다. 기록이 길어져도 비용이 일정하다."""
+        return self.user_memory.get_context(author)
 
     def log_chat(self, message):
-        self.log_file.write(message + "\n")
-        self.log_file.flush()
+        self.log_writer.write("chat_log.txt", message + "\n")
 
 def fetch_youtube_chat_main_thread(video_id, chatbot):
     chatbot.fetch_youtube_chat(video_id)
@@ -393,8 +699,7 @@ if __name__ == '__main__':
     parser.add_argument('--video_id', type=str, required=True)
     args = parser.parse_args()
 
-    with open('cookies.json', 'r', encoding='utf-8') as f:
-        cookies = json.load(f)
+    cookies = load_cookies()
 
     logger = get_logger()
     chatbot = ChatBot()
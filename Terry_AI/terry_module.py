@@ -0,0 +1,17 @@
+# terry_module.py
+
+import importlib.util
+import os
+import sys
+
+
+def load_terry():
+    """terry2.2.py는 파일 이름에 점이 있어서 import 문으로 불러올 수 없으므로 경로로 불러온다."""
+    if "terry" in sys.modules:
+        return sys.modules["terry"]
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "terry2.2.py")
+    spec = importlib.util.spec_from_file_location("terry", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["terry"] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,42 @@
+# tests/test_prompt_builder.py
+#   python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import PromptBuilder
+from user_memory import UserMemoryStore
+
+
+def count_in(messages, text):
+    return sum(message["content"].count(text) for message in messages)
+
+
+def test_current_message_appears_once():
+    builder = PromptBuilder("system")
+    message = "테리 오늘 저녁 뭐 먹었어요?"
+    # prepare_message가 history에 먼저 넣고, 시청자 기록의 마지막 줄에도 같은 메시지가 들어 있는 상황
+    history = [{"role": "user", "content": "viewer: 안녕하세요"}, {"role": "user", "content": f"viewer: {message}"}]
+    user_data = ("viewer: 지금까지 채팅 2회, 처음 본 날 2024-05-01, 마지막 채팅 2024-05-01 21:03\n"
+                 "2024-05-01 21:02:00: 안녕하세요\n"
+                 f"2024-05-01 21:03:00: {message}")
+
+    messages = builder.build(history, "viewer", message, user_data)
+
+    assert count_in(messages, message) == 1
+    assert messages[-1]["content"] == f"viewer: {message}"
+    assert "안녕하세요" in messages[-2]["content"]
+
+
+def test_current_message_appears_once_with_saved_history(tmp_path):
+    store = UserMemoryStore(db_path=str(tmp_path / "user_memory.db"), legacy_dir=str(tmp_path))
+    try:
+        store.add("viewer", "안녕하세요")
+        store.add("viewer", "MBTI 뭐예요?")
+        messages = PromptBuilder("system").build([], "viewer", "MBTI 뭐예요?", store.get_context("viewer"))
+    finally:
+        store.close()
+
+    assert count_in(messages, "MBTI 뭐예요?") == 1
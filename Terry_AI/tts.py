@@ -0,0 +1,166 @@
+# tts.py
+
+import queue
+import subprocess
+import threading
+import time
+
+import requests
+
+from metrics import metrics
+
+ELEVENLABS_STREAM_URL = 'https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream'
+
+
+def sample_rate_of(output_format):
+    """'pcm_24000', 'mp3_44100_128' 같은 ElevenLabs 출력 형식에서 샘플레이트를 꺼낸다."""
+    parts = output_format.split('_')
+    return int(parts[1]) if len(parts) > 1 else 44100
+
+
+def decode_mp3_stream(chunks, sample_rate):
+    """MP3 조각을 ffmpeg에 흘려 넣으면서, 디코딩된 16bit mono PCM을 도착하는 대로 돌려준다."""
+    process = subprocess.Popen(
+        ["ffmpeg", "-loglevel", "quiet", "-f", "mp3", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+
+    fed = {}
+
+    def feed():
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk)
+        except Exception as e:
+            print(f"MP3 스트림 전달 중 오류: {e}")
+        finally:
+            fed["at"] = time.perf_counter()
+            process.stdin.close()
+
+    threading.Thread(target=feed, daemon=True).start()
+    while True:
+        data = process.stdout.read1(8192)
+        if not data:
+            break
+        yield data
+    process.wait()
+    # 입력이 다 들어간 뒤 디코딩이 끝나기까지 더 걸린 시간만 잰다 (앞부분은 네트워크 시간과 겹친다)
+    if "at" in fed:
+        metrics.observe("terry_stage_seconds", time.perf_counter() - fed["at"], stage="mp3_decode")
+
+
+class SpeechStream:
+    """합성 중인 음성 하나. 백그라운드에서 받은 PCM 조각을 chunks()로 순서대로 꺼낸다."""
+
+    def __init__(self, text, sample_rate):
+        self.text = text
+        self.sample_rate = sample_rate
+        self.queue = queue.Queue()
+        self.error = None
+        self.first_chunk_at = None
+
+    def put(self, chunk):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.time()
+        self.queue.put(chunk)
+
+    def close(self, error=None):
+        self.error = error
+        self.queue.put(None)
+
+    def chunks(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+
+class ElevenLabsTTS:
+    """
+    ElevenLabs 스트리밍 API 클라이언트.
+    open_stream()은 바로 반환되고 다운로드/디코딩은 백그라운드에서 진행되므로,
+    앞 문장을 재생하는 동안 다음 문장을 미리 받아둘 수 있다.
+    """
+
+    def __init__(self, config, cache=None):
+        self.config = config
+        self.cache = cache
+        self.output_format = config.get("output_format", "pcm_24000")
+        self.sample_rate = sample_rate_of(self.output_format)
+        self.chunk_size = config.get("chunk_size", 4096)
+        self.session = requests.Session()
+
+    def cache_key(self, text):
+        return self.cache.make_key(self.config["voice_id"], self.config["model_id"],
+                                   self.config["voice_settings"], self.output_format, text)
+
+    def open_stream(self, text):
+        stream = SpeechStream(text, self.sample_rate)
+        if self.cache is not None:
+            pcm = self.cache.get(self.cache_key(text))
+            if pcm is not None:
+                metrics.inc("terry_tts_cache_total", result="hit")
+                stream.put(pcm)
+                stream.close()
+                return stream
+            metrics.inc("terry_tts_cache_total", result="miss")
+        threading.Thread(target=self._download, args=(stream,), daemon=True).start()
+        return stream
+
+    def _download(self, stream):
+        url = ELEVENLABS_STREAM_URL.format(voice_id=self.config["voice_id"])
+        headers = {
+            'accept': '*/*',
+            'xi-api-key': self.config["api_key"],
+            'Content-Type': 'application/json'
+        }
+        data = {
+            'text': stream.text,
+            'model_id': self.config["model_id"],
+            'voice_settings': self.config["voice_settings"]
+        }
+        start = time.perf_counter()
+        try:
+            response = self.session.post(url, params={'output_format': self.output_format},
+                                         headers=headers, json=data, stream=True, timeout=(5, 30))
+            response.raise_for_status()
+            body = response.iter_content(chunk_size=self.chunk_size)
+            if self.output_format.startswith("mp3"):
+                body = decode_mp3_stream(body, self.sample_rate)
+
+            # 16bit 샘플이 반으로 잘리지 않도록 짝수 바이트 단위로만 넘긴다
+            pending = b""
+            received = []
+            for chunk in body:
+                pending += chunk
+                usable = len(pending) - len(pending) % 2
+                if usable:
+                    if not received:
+                        metrics.observe("terry_tts_first_byte_seconds", time.perf_counter() - start)
+                    stream.put(pending[:usable])
+                    received.append(pending[:usable])
+                    pending = pending[usable:]
+        except Exception as e:
+            metrics.inc("terry_tts_errors_total")
+            stream.close(e)
+            return
+
+        stream.close()
+        metrics.observe("terry_stage_seconds", time.perf_counter() - start, stage="tts")
+        if self.cache is not None and received:
+            self.cache.put(self.cache_key(stream.text), b"".join(received))
+
+    def prewarm(self, phrases):
+        """자주 쓰는 고정 문장을 미리 합성해서 캐시에 넣어둔다."""
+        for text in phrases:
+            if self.cache.contains(self.cache_key(text)):
+                continue
+            try:
+                for _ in self.open_stream(text).chunks():
+                    pass
+            except Exception as e:
+                print(f"TTS 캐시 미리 만들기 실패 ({text}): {e}")
@@ -0,0 +1,89 @@
+# tts_cache.py
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class TTSCache:
+    """
+    디코딩된 PCM 음성을 디스크에 저장하는 캐시.
+    (voice_id, model_id, voice_settings, 출력 형식, 문장)의 해시를 파일 이름으로 쓰고,
+    전체 크기가 max_bytes를 넘으면 가장 오래 안 쓴 파일부터 지운다.
+    """
+
+    def __init__(self, cache_dir="tts_cache", max_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> 파일 크기, 앞쪽일수록 오래 안 쓴 것
+        self.total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load_index()
+
+    def load_index(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".pcm"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def make_key(voice_id, model_id, voice_settings, output_format, text):
+        raw = json.dumps([voice_id, model_id, voice_settings, output_format, text],
+                         sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_of(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pcm")
+
+    def contains(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+        try:
+            path = self.path_of(key)
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)  # 재시작 후에도 LRU 순서가 유지되도록 mtime 갱신
+            return data
+        except OSError:
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+
+    def put(self, key, data):
+        path = self.path_of(key)
+        # 같은 문장을 두 스레드가 동시에 저장할 수 있으므로 쓸 때마다 다른 임시 파일에 쓰고 바꿔치기한다
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        with self.lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, size = self.entries.popitem(last=False)
+                self.total_bytes -= size
+                try:
+                    os.remove(self.path_of(old_key))
+                except OSError:
+                    pass
@@ -0,0 +1,181 @@
+# user_memory.py
+
+import atexit
+import datetime
+import os
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+
+class UserMemoryStore:
+    """
+    시청자별 채팅 기록 저장소.
+    SQLite에 (author, id) 인덱스를 걸어두고 최근 K개 메시지와 짧은 요약만 꺼내기 때문에,
+    오래 본 시청자라도 메시지 하나당 비용이 늘어나지 않는다.
+    자주 말하는 시청자는 메모리 LRU에 두고, 쓰기는 모아서 백그라운드 스레드가 한 번에 저장한다.
+    """
+
+    def __init__(self, db_path="user_data/user_memory.db", recent_count=10, hot_users=256,
+                 flush_interval=2.0, batch_size=50, legacy_dir="user_data"):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.recent_count = recent_count
+        self.hot_users = hot_users
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.legacy_dir = legacy_dir
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, author TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, message TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_author ON messages (author, id)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "author TEXT PRIMARY KEY, message_count INTEGER NOT NULL, "
+            "first_seen TEXT NOT NULL, last_seen TEXT NOT NULL)"
+        )
+        self.conn.commit()
+
+        # 채팅을 받는 스레드가 DB를 건드리지 않고 처음 온 시청자인지 알 수 있도록 이름만 메모리에 둔다
+        self.known_authors = {author for author, in self.conn.execute("SELECT author FROM users")}
+        if os.path.isdir(legacy_dir):
+            self.known_authors.update(name[:-len("_history.txt")] for name in os.listdir(legacy_dir)
+                                      if name.endswith("_history.txt"))
+
+        self.db_lock = threading.Lock()
+        self.cache_lock = threading.Lock()
+        self.cache = OrderedDict()  # author -> {"recent", "count", "first_seen", "last_seen"}
+        self.pending = []
+        self.flush_event = threading.Event()
+        self.running = True
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def add(self, author, message):
+        now = str(datetime.datetime.now())
+        self.known_authors.add(author)
+        with self.cache_lock:
+            entry = self.get_entry(author)
+            entry["recent"].append((now, message))
+            entry["count"] += 1
+            entry["first_seen"] = entry["first_seen"] or now
+            entry["last_seen"] = now
+            self.pending.append((author, now, message))
+            if len(self.pending) >= self.batch_size:
+                self.flush_event.set()
+
+    def is_known(self, author):
+        """전에 채팅한 적이 있는 시청자인지. DB를 읽지 않으므로 이벤트 루프나 수신 스레드에서 불러도 된다."""
+        return author in self.known_authors
+
+    def message_count(self, author):
+        with self.cache_lock:
+            return self.get_entry(author)["count"]
+
+    def get_context(self, author):
+        """프롬프트에 넣을 요약 + 최근 메시지."""
+        with self.cache_lock:
+            entry = self.get_entry(author)
+            if entry["count"] == 0:
+                return ""
+            summary = (f"{author}: 지금까지 채팅 {entry['count']}회, "
+                       f"처음 본 날 {entry['first_seen'][:10]}, 마지막 채팅 {entry['last_seen'][:16]}")
+            lines = [f"{created_at}: {message}" for created_at, message in entry["recent"]]
+        return summary + "\n" + "\n".join(lines)
+
+    def get_entry(self, author):
+        # cache_lock을 잡은 상태에서 호출한다
+        entry = self.cache.get(author)
+        if entry is not None:
+            self.cache.move_to_end(author)
+            return entry
+
+        entry = self.load_entry(author)
+        self.cache[author] = entry
+        if len(self.cache) > self.hot_users:
+            self.cache.popitem(last=False)
+        return entry
+
+    def load_entry(self, author):
+        # 아직 저장되지 않은 메시지가 빠지지 않도록 먼저 비운다
+        self.flush_pending()
+        with self.db_lock:
+            rows = self.conn.execute(
+                "SELECT created_at, message FROM messages WHERE author = ? ORDER BY id DESC LIMIT ?",
+                (author, self.recent_count)
+            ).fetchall()
+            user = self.conn.execute(
+                "SELECT message_count, first_seen, last_seen FROM users WHERE author = ?", (author,)
+            ).fetchone()
+
+        if user is None:
+            return self.import_legacy_history(author)
+
+        return {
+            "recent": deque(reversed(rows), maxlen=self.recent_count),
+            "count": user[0],
+            "first_seen": user[1],
+            "last_seen": user[2],
+        }
+
+    def import_legacy_history(self, author):
+        """예전 user_data/{author}_history.txt 파일이 있으면 한 번만 DB로 옮긴다."""
+        entry = {"recent": deque(maxlen=self.recent_count), "count": 0, "first_seen": None, "last_seen": None}
+        filename = os.path.join(self.legacy_dir, f"{author}_history.txt")
+        if not os.path.exists(filename):
+            return entry
+
+        rows = []
+        with open(filename, "r", encoding="utf-8") as file:
+            for line in file:
+                created_at, _, message = line.rstrip("\n").partition(": ")
+                rows.append((author, created_at, message))
+                entry["recent"].append((created_at, message))
+        if not rows:
+            return entry
+
+        entry.update(count=len(rows), first_seen=rows[0][1], last_seen=rows[-1][1])
+        with self.db_lock:
+            self.conn.executemany("INSERT INTO messages (author, created_at, message) VALUES (?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)",
+                              (author, entry["count"], entry["first_seen"], entry["last_seen"]))
+            self.conn.commit()
+        return entry
+
+    def flush_pending(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        with self.db_lock:
+            self.conn.executemany("INSERT INTO messages (author, created_at, message) VALUES (?, ?, ?)", pending)
+            self.conn.executemany(
+                "INSERT INTO users VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(author) DO UPDATE SET message_count = message_count + 1, last_seen = excluded.last_seen",
+                [(author, created_at, created_at) for author, created_at, _ in pending]
+            )
+            self.conn.commit()
+
+    def write_loop(self):
+        while self.running:
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+            try:
+                with self.cache_lock:
+                    self.flush_pending()
+            except Exception as e:
+                print(f"유저 기록 저장 중 오류: {e}")
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.flush_event.set()
+        self.writer.join()
+        with self.cache_lock:
+            self.flush_pending()
+        self.conn.close()